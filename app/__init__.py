@@ -1,13 +1,16 @@
 from flask import Flask
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from .jwt_cache import CachingJWTManager
+from .passwords import PasswordHasher
 
 # xtensiones de Flask
 db = SQLAlchemy()
 migrate = Migrate()
-jwt = JWTManager()
+jwt = CachingJWTManager()
+hasher = PasswordHasher()
 
 
 def create_app():
@@ -15,15 +18,72 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # IP real del cliente detras de un proxy (la usa el limite de intentos de login)
+    if app.config.get("PROXY_FIX_X_FOR") or app.config.get("PROXY_FIX_X_PROTO"):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"],
+                                x_proto=app.config["PROXY_FIX_X_PROTO"])
+
+    # Proveedor JSON de las respuestas (antes de registrar las vistas)
+    from . import jsonprovider
+    jsonprovider.init_app(app)
+
     # Inicializar extensiones
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    hasher.init_app(app)
 
     #importar modelos para que SQLAlchemy los reconozca
     from . import models
+
+    # Identidad del usuario a partir de los claims del JWT
+    from . import identity
+    identity.init_app(app)
+
+    # Tokens revocados (logout)
+    from . import revocation
+    revocation.init_app(app)
+
+    # Limite de intentos de login
+    from . import ratelimit
+    ratelimit.init_app(app)
+
+    # Planilla de produccion de la cocina
+    from . import production
+    production.init_app(app)
+
+    # Stream de cambios de estado de ordenes
+    from . import events
+    events.init_app(app)
+
+    # Reintentos con Idempotency-Key
+    from . import idempotency
+    idempotency.init_app(app)
+
+    # Group commit opcional de las escrituras de ordenes
+    from . import groupcommit
+    groupcommit.init_app(app)
+
+    # Serializadores compilados de los esquemas de salida
+    from . import serializers
+    serializers.init_app(app)
+
+    # Versiones por tabla para los GET condicionales
+    from . import versions
+    versions.init_app(app)
+
+    # Catalogo de productos ya serializado
+    from . import catalog
+    catalog.init_app(app)
+
+    # Cola de ordenes aceptadas con 202
+    from . import submissions
+    submissions.init_app(app)
     
     from .routes import register_routes
     register_routes(app)
+
+    from .cli import register_commands
+    register_commands(app)
     
     return app
\ No newline at end of file
@@ -0,0 +1,93 @@
+# Catalogo de productos (GET /products) ya serializado.
+#
+# El catalogo cambia unas pocas veces por semana pero se pide en cada pantalla.
+# Cada pagina (una por combinacion de parametros: filtros, cursor, limite) se
+# guarda por proceso con el JSON listo en bytes y, si conviene, tambien
+# comprimido con gzip; la respuesta se arma directamente con esos buffers, sin
+# consultar ni serializar. Cada pagina recuerda la version de la tabla products
+# con la que se armo (ver app/versions.py): cualquier alta, cambio o baja de un
+# Product la incrementa en el flush, y la pagina se vuelve a armar en el proximo
+# pedido. Asi tambien se ven los cambios hechos por otros procesos, con el
+# atraso de TABLE_VERSIONS_TTL.
+#
+# X-Catalog-Version es un hash del contenido de la pagina: el cliente puede
+# compararlo para saber si algo cambio.
+
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+from .lru import LRUCache
+from .pagination import page_headers
+from .versions import current_versions
+
+# Paginas del catalogo por parametros del request
+catalog_cache = LRUCache(maxsize=64, name="catalog")
+
+VERSION_HEADER = "X-Catalog-Version"
+
+
+class CatalogPage:
+    __slots__ = ("body", "gzipped", "version", "next_cursor", "table_version")
+
+    def __init__(self, body, gzipped, version, next_cursor, table_version):
+        self.body = body
+        self.gzipped = gzipped
+        self.version = version
+        self.next_cursor = next_cursor
+        self.table_version = table_version
+
+
+def table_version():
+    return current_versions().get("products", (0, None))[0]
+
+
+def page_key():
+    """Clave de la pagina: los parametros del request, sin importar el orden"""
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+def cached_page():
+    """Pagina guardada si se armo con la version actual de products, si no None"""
+    page = catalog_cache.get(page_key())
+    if page is not None and page.table_version == table_version():
+        return page
+    return None
+
+
+def store_page(data, next_cursor, generation, products_version):
+    """Serializa la pagina una sola vez y la guarda; devuelve la CatalogPage.
+
+    generation (la de catalog_cache) y products_version (table_version()) se
+    leen antes de consultar, para no guardar una pagina con una version nueva
+    y datos viejos.
+    """
+    body = current_app.json.response(data).get_data()
+    gzipped = None
+    # Las paginas chicas no ganan nada comprimidas
+    if current_app.config.get("CATALOG_GZIP", True) and len(body) >= current_app.config.get("CATALOG_GZIP_MIN_SIZE", 1024):
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    page = CatalogPage(body, gzipped, hashlib.sha256(body).hexdigest()[:16], next_cursor, products_version)
+    catalog_cache.set(page_key(), page, generation=generation)
+    return page
+
+
+def page_response(page, cached):
+    """Respuesta armada con los buffers de la pagina"""
+    headers = {
+        VERSION_HEADER: page.version,
+        "X-Cache": "HIT" if cached else "MISS",
+        "Vary": "Accept-Encoding",
+        **page_headers(page.next_cursor)
+    }
+    if page.gzipped is not None and request.accept_encodings["gzip"]:
+        body = page.gzipped
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = page.body
+    return current_app.response_class(body, status=200, headers=headers, mimetype="application/json")
+
+
+def init_app(app):
+    catalog_cache.configure(app.config.get("CATALOG_CACHE_SIZE", 64), app.config.get("CATALOG_CACHE_TTL"))
@@ -0,0 +1,590 @@
+# Comandos de consola (flask <grupo> <comando>)
+
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, timedelta
+from functools import partial
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from marshmallow import ValidationError
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from . import db
+from .models import User, Product, MenuDay, MenuItem, Order, OrderItem
+from .orders import find_drifted_totals, recalculate_totals, place_order
+from .groupcommit import committer, run_write
+from .submissions import process_batch
+from .passwords import hash_method, calibrate, method_file, write_method_file
+from .revocation import revocations
+from .tokens import purge_expired as purge_refresh_tokens
+from .idempotency import purge as purge_idempotency_keys
+from .stock import OutOfStock, set_capacity, take, remaining_by_item
+from .schemas import UserSchema, ProductSchema, OrderSchema, OrderItemSchema, MenuDayWithProductsSchema
+from .serializers import compiled, loader
+from .jsonprovider import make_provider, orjson
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+passwords_cli = AppGroup("passwords", help="Herramientas de hashing de contraseñas")
+
+
+def measure_verify_rate(method, seconds):
+    """Verificaciones por segundo en un solo nucleo; devuelve (metodo normalizado, tasa)"""
+    pwhash = generate_password_hash("benchmark", method)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        check_password_hash(pwhash, "benchmark")
+        count += 1
+    return hash_method(pwhash), count / (time.perf_counter() - start)
+
+
+@passwords_cli.command("calibrate")
+@click.option("--write/--no-write", default=True, show_default=True,
+              help="Guardar el metodo en PASSWORD_HASH_METHOD_FILE para todos los procesos")
+def calibrate_passwords(write):
+    """Elige el metodo de hash para este hardware (una vez, no en cada arranque)"""
+    method = calibrate(current_app.config["PASSWORD_HASH_CANDIDATES"], current_app.config["PASSWORD_HASH_TARGET_MS"])
+    if write:
+        path = method_file(current_app)
+        write_method_file(path, method)
+        click.echo(f"metodo guardado en {path}")
+        if os.getenv("PASSWORD_HASH_METHOD"):
+            click.echo("aviso: PASSWORD_HASH_METHOD esta fijado en el entorno y tiene prioridad")
+    click.echo(f"PASSWORD_HASH_METHOD={method}")
+
+
+@passwords_cli.command("bench")
+@click.option("--seconds", default=2.0, show_default=True, help="Duracion de la medicion por candidato")
+@click.option("--clients", default=500, show_default=True, help="Clientes simulados para estimar logins por dia")
+@click.option("--restarts", default=3, show_default=True, help="Reinicios de la app por cliente y por dia")
+@click.option("--legacy-hours", default=12, show_default=True, help="Duracion del token sin refresh")
+def bench_passwords(seconds, clients, restarts, legacy_hours):
+    """Verificaciones de login por segundo y por nucleo para cada candidato"""
+    cores = os.cpu_count() or 1
+    current = current_app.config["PASSWORD_HASH_METHOD"]
+    current_rate = None
+
+    click.echo(f"{'metodo':<22} {'ms/verif':>9} {'verif/s/nucleo':>15} {'verif/s total':>14}")
+    for candidate in current_app.config["PASSWORD_HASH_CANDIDATES"]:
+        method, rate = measure_verify_rate(candidate, seconds)
+        marker = ""
+        if method == current:
+            current_rate = rate
+            marker = "  <- actual"
+        click.echo(f"{method:<22} {1000 / rate:>9.1f} {rate:>15.1f} {rate * cores:>14.1f}{marker}")
+
+    click.echo(f"objetivo: {current_app.config['PASSWORD_HASH_TARGET_MS']} ms, {cores} nucleos")
+    if current_rate is None:
+        current_rate = measure_verify_rate(current, seconds)[1]
+
+    # Logins por dia: sin refresh cada vencimiento y cada reinicio exige la contraseña;
+    # con refresh solo cuando vence el refresh token (se guarda en el dispositivo)
+    access_hours = current_app.config["JWT_ACCESS_TOKEN_EXPIRES"].total_seconds() / 3600
+    refresh_hours = current_app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds() / 3600
+    legacy_logins = clients * (24 / legacy_hours + restarts)
+    logins = clients * 24 / refresh_hours
+    refreshes = clients * (24 / access_hours + restarts)
+
+    click.echo("")
+    click.echo(f"{clients} clientes, {restarts} reinicios por dia, metodo {current}")
+    click.echo(f"{'modo':<28} {'logins/dia':>11} {'cpu hash s/dia':>15} {'refresh/dia':>12}")
+    click.echo(f"{f'sin refresh (token {legacy_hours}h)':<28} {legacy_logins:>11.0f} "
+               f"{legacy_logins / current_rate:>15.1f} {0:>12}")
+    click.echo(f"{f'con refresh ({access_hours * 60:.0f}min/{refresh_hours / 24:.0f}d)':<28} {logins:>11.0f} "
+               f"{logins / current_rate:>15.1f} {refreshes:>12.0f}")
+    click.echo(f"reduccion de logins: {100 * (1 - logins / legacy_logins):.1f}%")
+
+
+tokens_cli = AppGroup("tokens", help="Mantenimiento de tokens JWT")
+
+
+@tokens_cli.command("purge")
+def purge_tokens():
+    """Borra los tokens revocados y los refresh tokens que ya vencieron"""
+    click.echo(f"{revocations.purge()} tokens revocados eliminados")
+    click.echo(f"{purge_refresh_tokens()} refresh tokens eliminados")
+
+
+idempotency_cli = AppGroup("idempotency", help="Mantenimiento de claves de idempotencia")
+
+
+@idempotency_cli.command("purge")
+def purge_idempotency():
+    """Borra las claves de idempotencia que ya vencieron"""
+    click.echo(f"{purge_idempotency_keys()} claves eliminadas")
+
+
+users_cli = AppGroup("users", help="Gestion de usuarios")
+
+
+def read_user_rows(path, fmt):
+    """Genera (linea, datos) de un CSV con encabezado o de un NDJSON"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                # Las celdas vacias cuentan como campo ausente (ej: role toma su default)
+                yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as err:
+                    yield number, err
+
+
+@users_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Por defecto segun la extension")
+@click.option("--chunk-size", default=1000, show_default=True, help="Filas por transaccion")
+@click.option("--workers", default=None, type=int, help="Procesos para hashear (por defecto uno por nucleo)")
+def import_users(path, fmt, chunk_size, workers):
+    """Crea usuarios en masa desde un CSV o NDJSON (username, password, role, phone)"""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    schema = UserSchema()
+    errors = []
+    seen = set()
+    created = total = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(read_user_rows(path, fmt), chunk_size):
+            total += len(chunk)
+
+            # Validacion y duplicados dentro del mismo archivo
+            valid = []
+            for line, data in chunk:
+                if isinstance(data, Exception):
+                    errors.append((line, f"JSON invalido: {data}"))
+                    continue
+                try:
+                    user_data = schema.load(data)
+                except ValidationError as err:
+                    errors.append((line, err.messages))
+                    continue
+                username = user_data["username"].lower()
+                if username in seen:
+                    errors.append((line, "Usuario repetido en el archivo"))
+                    continue
+                seen.add(username)
+                valid.append((line, username, user_data))
+
+            # Usuarios que ya existen, en pocas consultas IN
+            existing = set()
+            for part in chunked([username for _, username, _ in valid], 500):
+                existing.update(db.session.scalars(select(User.username).where(User.username.in_(part))))
+            for line, username, _ in valid:
+                if username in existing:
+                    errors.append((line, "El nombre de usuario ya existe"))
+            valid = [row for row in valid if row[1] not in existing]
+            if not valid:
+                continue
+
+            hashes = pool.map(
+                partial(generate_password_hash, method=method),
+                [user_data["password"] for _, _, user_data in valid],
+                chunksize=max(1, len(valid) // ((workers or os.cpu_count() or 1) * 4))
+            )
+            now = datetime.now()
+            rows = [{
+                "username": username,
+                "password_hash": password_hash,
+                "role": user_data.get("role", "client"),
+                "phone": user_data.get("phone"),
+                "created_at": now
+            } for (_, username, user_data), password_hash in zip(valid, hashes)]
+
+            try:
+                db.session.execute(insert(User), rows) # executemany en una sola transaccion
+                db.session.commit()
+                created += len(rows)
+            except IntegrityError:
+                # Alguien registro uno de estos usuarios mientras tanto: fila por fila
+                db.session.rollback()
+                for (line, _, _), row in zip(valid, rows):
+                    try:
+                        db.session.execute(insert(User), [row])
+                        db.session.commit()
+                        created += 1
+                    except IntegrityError:
+                        db.session.rollback()
+                        errors.append((line, "El nombre de usuario ya existe"))
+
+            elapsed = time.perf_counter() - start
+            click.echo(f"{total} filas procesadas, {created} creados ({created / elapsed:.1f} usuarios/s)")
+
+    elapsed = time.perf_counter() - start
+    for line, message in sorted(errors, key=lambda e: e[0]):
+        click.echo(f"linea {line}: {message}", err=True)
+    click.echo(f"{created} usuarios creados de {total} filas en {elapsed:.1f} s "
+               f"({created / elapsed if elapsed else 0:.1f} usuarios/s), {len(errors)} errores")
+
+
+orders_cli = AppGroup("orders", help="Mantenimiento de ordenes")
+
+
+@orders_cli.command("reconcile")
+@click.option("--batch-size", default=500, show_default=True, help="Ordenes revisadas por lote")
+@click.option("--dry-run", is_flag=True, help="Solo informar, sin corregir")
+def reconcile_totals(batch_size, dry_run):
+    """Busca y corrige ordenes cuyo total no coincide con la suma de sus items"""
+    last_id = 0
+    checked = fixed = 0
+    while True:
+        batch_last_id, drifted = find_drifted_totals(last_id, batch_size)
+        if batch_last_id is None:
+            break
+        checked += 1
+        for order_id, total, expected in drifted:
+            click.echo(f"orden {order_id}: total {total:.2f}, items {expected:.2f}")
+        if drifted and not dry_run:
+            recalculate_totals([order_id for order_id, _, _ in drifted])
+            fixed += len(drifted)
+        db.session.commit() # Una transaccion por lote
+        last_id = batch_last_id
+
+    action = "corregidas" if not dry_run else "sin corregir (--dry-run)"
+    click.echo(f"{checked} lotes revisados, {fixed} ordenes {action}")
+
+
+@orders_cli.command("process-submissions")
+@click.option("--batch-size", default=50, show_default=True, help="Pedidos por transaccion")
+@click.option("--loop", is_flag=True, help="Seguir esperando pedidos nuevos")
+@click.option("--poll", default=1.0, show_default=True, help="Segundos entre consultas con --loop")
+def process_submissions(batch_size, loop, poll):
+    """Crea las ordenes de los pedidos aceptados con 202 (worker fuera del proceso web)"""
+    total = 0
+    while True:
+        processed = process_batch(batch_size)
+        total += processed
+        if processed:
+            click.echo(f"{processed} pedidos procesados")
+        elif not loop:
+            break
+        else:
+            time.sleep(poll)
+    click.echo(f"{total} pedidos procesados en total")
+
+
+def scratch_menu_item(capacity):
+    """Producto, menu del dia e item temporales para los benchmarks (en una fecha libre)"""
+    day = date(9999, 12, 31)
+    while db.session.scalar(select(MenuDay.id).where(MenuDay.date == day)):
+        day -= timedelta(days=1)
+    menu_day = MenuDay(date=day, is_open=True)
+    product = Product(name="bench", price=1, active=True)
+    db.session.add_all([menu_day, product])
+    db.session.flush()
+    item = MenuItem(menu_day_id=menu_day.id, products_id=product.id)
+    db.session.add(item)
+    db.session.flush()
+    set_capacity(item, capacity)
+    db.session.commit()
+    return menu_day.id, product.id, item.id
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+@orders_cli.command("bench-commit")
+@click.option("--threads", default=32, show_default=True, help="Requests concurrentes simuladas")
+@click.option("--orders", default=2000, show_default=True, help="Ordenes por modo")
+@click.option("--window-ms", default=None, type=float, help="Ventana del group commit (por defecto la configurada)")
+@click.option("--max-batch", default=None, type=int, help="Maximo de ordenes por commit (por defecto el configurado)")
+def bench_commit(threads, orders, window_ms, max_batch):
+    """Ordenes/s y latencia con commit por request vs group commit.
+
+    Crea ordenes de un item en un menu del dia temporal, con un usuario temporal;
+    todo se borra al terminar.
+    """
+    app = current_app._get_current_object()
+    saved = committer.window, committer.max_batch
+    if window_ms is not None:
+        committer.window = window_ms / 1000
+    if max_batch is not None:
+        committer.max_batch = max_batch
+
+    menu_day_id, product_id, item_id = scratch_menu_item(None)
+    user = User(username=f"bench-{time.time_ns()}", password_hash="!", role="client")
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+    rows = [{"product_id": product_id, "quantity": 1, "price": 1.0}]
+
+    click.echo(f"{'modo':<8} {'ordenes/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'por commit':>11}")
+    try:
+        for mode, group in (("request", False), ("group", True)):
+            latencies = []
+            lock = threading.Lock()
+            batches_before, jobs_before = committer.batches, committer.jobs
+            per_thread = [orders // threads + (1 if n < orders % threads else 0) for n in range(threads)]
+
+            def worker(count):
+                with app.app_context():
+                    measured = []
+                    for _ in range(count):
+                        start = time.perf_counter()
+                        run_write(partial(place_order, user_id, menu_day_id, rows), group=group)
+                        measured.append(time.perf_counter() - start)
+                    with lock:
+                        latencies.extend(measured)
+
+            pool = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+            start = time.perf_counter()
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            batches = committer.batches - batches_before
+            per_commit = (committer.jobs - jobs_before) / batches if group and batches else 1
+            click.echo(f"{mode:<8} {len(latencies) / elapsed:>10.1f} "
+                       f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+                       f"{percentile(latencies, 0.99) * 1000:>8.1f} {per_commit:>11.1f}")
+    finally:
+        committer.window, committer.max_batch = saved
+        order_ids = select(Order.id).where(Order.user_id == user_id)
+        db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        db.session.execute(delete(Order).where(Order.user_id == user_id))
+        db.session.delete(db.session.get(MenuItem, item_id))
+        db.session.delete(db.session.get(MenuDay, menu_day_id))
+        db.session.delete(db.session.get(Product, product_id))
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+stock_cli = AppGroup("stock", help="Cupo de porciones de los menus")
+
+
+@stock_cli.command("bench")
+@click.option("--threads", default=16, show_default=True, help="Hilos tomando porciones a la vez")
+@click.option("--orders", default=2000, show_default=True, help="Ordenes simuladas por configuracion")
+@click.option("--shards", default="1,8", show_default=True, help="Cantidades de shards a comparar")
+def bench_stock(threads, orders, shards):
+    """Ordenes por segundo sobre un unico plato muy pedido, con distintos shards.
+
+    Cada orden toma una porcion y hace commit en su propia transaccion. Usa un
+    producto y un menu del dia temporales que se borran al terminar.
+    """
+    app = current_app._get_current_object()
+    configured = app.config.get("STOCK_SHARDS", 8)
+    click.echo(f"{'shards':>6} {'ordenes/s':>10} {'reintentos':>11} {'sin cupo':>9} {'restante':>9}")
+    try:
+        for shard_count in [int(value) for value in shards.split(",")]:
+            app.config["STOCK_SHARDS"] = shard_count
+            menu_day_id, product_id, item_id = scratch_menu_item(orders)
+            counts = {"retries": 0, "out": 0}
+            lock = threading.Lock()
+            per_thread = [orders // threads + (1 if n < orders % threads else 0) for n in range(threads)]
+
+            def worker(count):
+                with app.app_context():
+                    for _ in range(count):
+                        while True:
+                            try:
+                                take(item_id, 1)
+                                db.session.commit()
+                                break
+                            except OutOfStock:
+                                db.session.rollback()
+                                with lock:
+                                    counts["out"] += 1
+                                break
+                            except OperationalError:
+                                # Deadlock o timeout de lock: se reintenta como lo haria el cliente
+                                db.session.rollback()
+                                with lock:
+                                    counts["retries"] += 1
+
+            pool = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+            start = time.perf_counter()
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            left = remaining_by_item([item_id]).get(item_id, 0)
+            click.echo(f"{shard_count:>6} {orders / elapsed:>10.1f} {counts['retries']:>11} {counts['out']:>9} {left:>9}")
+
+            db.session.delete(db.session.get(MenuItem, item_id))
+            db.session.delete(db.session.get(MenuDay, menu_day_id))
+            db.session.delete(db.session.get(Product, product_id))
+            db.session.commit()
+    finally:
+        app.config["STOCK_SHARDS"] = configured
+
+
+serializers_cli = AppGroup("serializers", help="Serializadores compilados de las respuestas")
+
+
+def sample_rows(rows):
+    """Objetos sin guardar (no tocan la base) para comparar serializadores"""
+    now = datetime.now()
+    products = [
+        Product(id=n, name=f"Producto {n}", description=None if n % 3 else "Con guarnición",
+                price=1000 + n * 0.5, active=n % 7 != 0, image_url=None, created_at=now, version=1)
+        for n in range(1, rows + 1)
+    ]
+    orders = [
+        Order(id=n, user_id=n % 50 + 1, menu_day_id=n % 5 + 1, total_price=float(n % 90 * 250),
+              status="CREADO", created_at=now, version=n % 3 + 1)
+        for n in range(1, rows + 1)
+    ]
+    # Menus de 10 items con su producto, como GET /menu_days?expand=items.product
+    menu_days = []
+    for n in range(1, rows // 10 + 1):
+        menu_day = MenuDay(id=n, date=date(2026, 1, 1) + timedelta(days=n), is_open=True, created_at=now)
+        menu_day.items = [
+            MenuItem(id=n * 10 + i, menu_day_id=n, products_id=product.id, capacity=None,
+                     created_at=now, product=product)
+            for i, product in enumerate(products[(n * 10) % rows:(n * 10) % rows + 10])
+        ]
+        menu_days.append(menu_day)
+    return [(ProductSchema, products), (OrderSchema, orders), (MenuDayWithProductsSchema, menu_days)]
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@serializers_cli.command("bench")
+@click.option("--rows", default=10000, show_default=True, help="Filas por listado")
+@click.option("--repeat", default=5, show_default=True, help="Repeticiones (se toma la mejor)")
+def bench_serializers(rows, repeat):
+    """Compara marshmallow con los serializadores compilados y verifica que den lo mismo"""
+    click.echo(f"{'esquema':<28} {'filas':>6} {'marshmallow/s':>14} {'compilado/s':>12} {'x':>6}")
+    mismatches = []
+    for schema_class, objs in sample_rows(rows):
+        reference = schema_class(many=True)
+        serializer = compiled(schema_class)
+        if reference.dump(objs) != serializer.dump_many(objs):
+            mismatches.append(schema_class.__name__)
+        slow = best_of(repeat, lambda: reference.dump(objs))
+        fast = best_of(repeat, lambda: serializer.dump_many(objs))
+        click.echo(f"{schema_class.__name__:<28} {len(objs):>6} {len(objs) / slow:>14.0f} "
+                   f"{len(objs) / fast:>12.0f} {slow / fast:>6.1f}")
+    if mismatches:
+        raise click.ClickException(f"Salida distinta a marshmallow: {', '.join(mismatches)}")
+    click.echo("Salida identica a marshmallow")
+
+
+def sample_payloads(count):
+    """Payloads de escritura de ordenes: (esquema, partial, validos, invalidos)"""
+    orders = [
+        {"menu_day_id": n % 5 + 1, "items": [{"product_id": p, "quantity": n % 3 + 1} for p in range(1, n % 4 + 2)]}
+        for n in range(count)
+    ]
+    bad_orders = [
+        {"menu_day_id": "x"},
+        {"items": [{"product_id": 1, "quantity": 0}]},
+        {"menu_day_id": 1, "items": [{"product_id": "2", "quantity": 1}], "extra": True},
+        {"menu_day_id": 1, "items": "no"},
+    ]
+    items = [{"order_id": n + 1, "product_id": n % 9 + 1, "quantity": n % 4 + 1} for n in range(count)]
+    bad_items = [{"order_id": 1}, {"order_id": 1, "product_id": None, "quantity": 1}, {"order_id": True}]
+    updates = [{"status": "EN_PREPARACION"} for _ in range(count)]
+    bad_updates = [{"status": "PERDIDO"}, {"total_price": 1}]
+    return [
+        (OrderSchema, ("user_id",), orders, bad_orders),
+        (OrderItemSchema, None, items, bad_items),
+        (OrderSchema, True, updates, bad_updates),
+    ]
+
+
+def load_outcome(fn, data):
+    try:
+        return "ok", fn(data)
+    except ValidationError as err:
+        return "error", err.messages
+
+
+@serializers_cli.command("bench-load")
+@click.option("--payloads", default=10000, show_default=True, help="Payloads validos por esquema")
+@click.option("--repeat", default=5, show_default=True, help="Repeticiones (se toma la mejor)")
+def bench_loaders(payloads, repeat):
+    """Validaciones por segundo de marshmallow y de los cargadores compilados.
+
+    Tambien verifica que datos y mensajes de error sean los mismos, con algunos
+    payloads invalidos ademas de los validos.
+    """
+    click.echo(f"{'esquema':<16} {'partial':<12} {'marshmallow/s':>14} {'compilado/s':>12} {'x':>6}")
+    mismatches = []
+    for schema_class, partial, valid, invalid in sample_payloads(payloads):
+        schema = schema_class()
+        compiled_loader = loader(schema_class, partial)
+        reference = lambda data: schema.load(data, partial=partial)
+        for data in valid[:100] + invalid:
+            if load_outcome(reference, data) != load_outcome(compiled_loader.load, data):
+                mismatches.append(f"{schema_class.__name__} {data}")
+        slow = best_of(repeat, lambda: [reference(data) for data in valid])
+        fast = best_of(repeat, lambda: [compiled_loader.load(data) for data in valid])
+        click.echo(f"{schema_class.__name__:<16} {str(partial):<12} {len(valid) / slow:>14.0f} "
+                   f"{len(valid) / fast:>12.0f} {slow / fast:>6.1f}")
+    if mismatches:
+        raise click.ClickException("Resultado distinto a marshmallow: " + "; ".join(mismatches))
+    click.echo("Mismos datos y errores que marshmallow")
+
+
+json_cli = AppGroup("json", help="Proveedor JSON de las respuestas")
+
+
+@json_cli.command("bench")
+@click.option("--rows", default=1000, show_default=True, help="Filas por respuesta")
+@click.option("--repeat", default=20, show_default=True, help="Repeticiones (se toma la mejor)")
+def bench_json(rows, repeat):
+    """Respuestas por segundo al serializar listados de productos y ordenes con cada proveedor"""
+    app = current_app._get_current_object()
+    providers = [("compat", "json"), ("fast", "json")]
+    if orjson is not None:
+        providers.append(("fast", "orjson"))
+    payloads = [(schema_class.__name__, compiled(schema_class).dump_many(objs))
+                for schema_class, objs in sample_rows(rows) if schema_class in (ProductSchema, OrderSchema)]
+
+    click.echo(f"{'proveedor':<14} {'payload':<14} {'respuestas/s':>13} {'MB/s':>8} {'bytes':>9}")
+    for provider_name, encoder in providers:
+        provider = make_provider(app, provider_name, encoder)
+        label = f"{provider_name}/{encoder}"
+        for name, payload in payloads:
+            with app.test_request_context():
+                size = len(provider.response(payload).get_data())
+                elapsed = best_of(repeat, lambda: provider.response(payload).get_data())
+            click.echo(f"{label:<14} {name:<14} {1 / elapsed:>13.1f} {size / elapsed / 1e6:>8.1f} {size:>9}")
+    if orjson is None:
+        click.echo("orjson no esta instalado: el proveedor fast usa json")
+
+
+def register_commands(app):
+    app.cli.add_command(passwords_cli)
+    app.cli.add_command(tokens_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(serializers_cli)
+    app.cli.add_command(json_cli)
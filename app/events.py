@@ -0,0 +1,220 @@
+# Eventos de cambios de estado de ordenes, para el stream SSE de /orders/stream.
+#
+# Los cambios se juntan en el flush de la sesion y se publican recien despues
+# del commit (un rollback los descarta), en un pub/sub dentro del proceso. Cada
+# conexion tiene su buffer acotado; si el cliente no lee a tiempo se descartan
+# los eventos mas viejos y se le manda un "reset" para que recargue con
+# GET /orders. Los ultimos eventos quedan en un historial para retomar el
+# stream con Last-Event-ID despues de una reconexion.
+#
+# Solo ve los commits de su propio proceso: con varios workers cada uno publica
+# lo que escribe, asi que el stream debe servirse desde un unico proceso (con
+# hilos o gevent, una conexion abierta ocupa un hilo).
+#
+# Cada stream abierto ocupa un hilo del servidor mientras dure. Por eso se
+# admiten como mucho ORDER_EVENTS_MAX_STREAMS a la vez (bastante menos que
+# SERVER_THREADS) y el siguiente recibe 503, para que la API siga teniendo
+# hilos libres. Para muchas pantallas abiertas hay que servir /orders/stream
+# desde un pool de workers aparte (ej: gunicorn con gevent detras de una
+# ruta propia en el proxy), no subir el limite.
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import event, inspect
+
+from . import db
+from .models import Order
+
+
+class Subscription:
+
+    def __init__(self, user_id, menu_day_id, maxlen):
+        self.user_id = user_id          # None: todas las ordenes (admin)
+        self.menu_day_id = menu_day_id  # None: todos los dias
+        self.events = deque(maxlen=maxlen)
+        self.lagged = False
+        self._ready = threading.Condition()
+
+    def matches(self, item):
+        return ((self.user_id is None or item["user_id"] == self.user_id) and
+                (self.menu_day_id is None or item["menu_day_id"] == self.menu_day_id))
+
+    def push(self, item):
+        with self._ready:
+            if len(self.events) == self.events.maxlen:
+                self.lagged = True # El deque descarta el mas viejo
+            self.events.append(item)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Eventos pendientes (y si se perdieron eventos); lista vacia si vencio el timeout"""
+        with self._ready:
+            if not self.events:
+                self._ready.wait(timeout)
+            pending = list(self.events)
+            self.events.clear()
+            lagged, self.lagged = self.lagged, False
+        return pending, lagged
+
+
+class OrderEventBroker:
+
+    def __init__(self, history=1000, buffer=100):
+        # Los ids de evento son "<arranque>.<secuencia>": un id de otro arranque
+        # del proceso no se puede retomar
+        self.boot = uuid.uuid4().hex[:8]
+        self.buffer = buffer
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self.max_streams = 0 # 0: sin limite
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def configure(self, history, buffer, max_streams=0):
+        with self._lock:
+            self._history = deque(self._history, maxlen=history)
+            self.buffer = buffer
+            self.max_streams = max_streams
+
+    def acquire_stream(self):
+        """Reserva un lugar para un stream; False si ya hay max_streams abiertos"""
+        with self._lock:
+            if self.max_streams and self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        with self._lock:
+            self._streams -= 1
+
+    def publish(self, items):
+        with self._lock:
+            for item in items:
+                self._seq += 1
+                item = {**item, "id": f"{self.boot}.{self._seq}"}
+                self._history.append(item)
+                for sub in self._subscribers:
+                    if sub.matches(item):
+                        sub.push(item)
+
+    def subscribe(self, user_id=None, menu_day_id=None, last_event_id=None):
+        """Nueva suscripcion; devuelve (suscripcion, si hay que mandar reset).
+
+        Con last_event_id se cargan los eventos del historial posteriores a ese id;
+        si ya no estan (historial rotado o proceso reiniciado) se pide un reset.
+        """
+        sub = Subscription(user_id, menu_day_id, self.buffer)
+        with self._lock:
+            self._subscribers.add(sub)
+            if not last_event_id:
+                return sub, False
+
+            boot, _, seq = last_event_id.partition(".")
+            if boot != self.boot or not seq.isdigit():
+                return sub, True
+            seq = int(seq)
+            oldest = int(self._history[0]["id"].split(".")[1]) if self._history else self._seq + 1
+            if seq < oldest - 1:
+                return sub, True
+            for item in self._history:
+                if int(item["id"].split(".")[1]) > seq and sub.matches(item):
+                    sub.push(item)
+        return sub, False
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "streams": self._streams,
+                    "history": len(self._history), "last_id": self._seq}
+
+
+broker = OrderEventBroker()
+
+
+def order_event(order_id, user_id, menu_day_id, status, version, kind="status"):
+    return {
+        "type": kind,
+        "order_id": order_id,
+        "user_id": user_id,
+        "menu_day_id": menu_day_id,
+        "status": status,
+        "version": version,
+        "at": time.time(),
+    }
+
+
+def queue_events(session, items):
+    """Encola eventos para publicar al hacer commit (para UPDATE masivos, que no pasan por el flush)"""
+    session.info.setdefault("order_events", []).extend(items)
+
+
+def format_sse(item):
+    data = json.dumps({k: v for k, v in item.items() if k != "id"}, separators=(",", ":"))
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {data}\n\n"
+
+
+def stream(heartbeat, **subscription):
+    """Generador de la respuesta SSE; el comentario de heartbeat mantiene viva la
+    conexion en los proxies y deja detectar clientes que se fueron.
+
+    La suscripcion se crea al empezar a iterar, asi el finally siempre la libera.
+    """
+    sub, reset = broker.subscribe(**subscription)
+    try:
+        yield "retry: 3000\n\n"
+        if reset:
+            yield "event: reset\ndata: {}\n\n"
+        while True:
+            pending, lagged = sub.wait(heartbeat)
+            if lagged:
+                yield "event: reset\ndata: {}\n\n"
+            if not pending:
+                yield ": ping\n\n"
+            for item in pending:
+                yield format_sse(item)
+    finally:
+        broker.unsubscribe(sub)
+
+
+# Publicacion: ordenes nuevas y cambios de estado de ordenes, al hacer commit
+
+@event.listens_for(db.session, "after_flush")
+def collect_order_events(session, flush_context):
+    items = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            items.append(order_event(obj.id, obj.user_id, obj.menu_day_id, obj.status, obj.version, "created"))
+    for obj in session.dirty:
+        if isinstance(obj, Order) and inspect(obj).attrs.status.history.has_changes():
+            items.append(order_event(obj.id, obj.user_id, obj.menu_day_id, obj.status, obj.version))
+    if items:
+        queue_events(session, items)
+
+
+@event.listens_for(db.session, "after_commit")
+def publish_order_events(session):
+    items = session.info.pop("order_events", None)
+    if items:
+        broker.publish(items)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_order_events(session):
+    session.info.pop("order_events", None)
+
+
+def init_app(app):
+    broker.configure(
+        app.config.get("ORDER_EVENTS_HISTORY", 1000),
+        app.config.get("ORDER_EVENTS_BUFFER", 100),
+        app.config.get("ORDER_EVENTS_MAX_STREAMS", 0)
+    )
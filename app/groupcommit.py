@@ -0,0 +1,185 @@
+# Group commit opcional para las escrituras de ordenes en la hora pico.
+#
+# Normalmente cada POST /orders o POST /order_items hace su propio commit, y con
+# muchas requests a la vez la base pasa la mayor parte del tiempo haciendo fsync.
+# Con GROUP_COMMIT_ENABLED las escrituras (ya validadas por la vista) se encolan:
+# un hilo las junta durante GROUP_COMMIT_WINDOW_MS o hasta GROUP_COMMIT_MAX_BATCH,
+# ejecuta cada una en su SAVEPOINT dentro de una misma transaccion y hace un solo
+# commit. Cada request espera el resultado de la suya en un Future; si una falla
+# (ej: sin cupo) solo se deshace su SAVEPOINT.
+#
+# Los trabajos corren en otro hilo y con otra sesion: no pueden usar objetos
+# cargados por la request, solo ids y valores. Por lo mismo, los requests con
+# Idempotency-Key no usan group commit: la clave se reserva en la transaccion
+# de la request y tiene que confirmarse junto con la orden.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from flask import g, has_request_context
+
+from . import db
+
+
+class GroupCommitTimeout(Exception):
+    """La escritura no se confirmo a tiempo (puede confirmarse despues)"""
+
+
+def copy_info(info):
+    # Copia de session.info para restaurarla si se deshace un SAVEPOINT: los
+    # cambios juntados por los listeners de after_flush de ese trabajo no valen
+    return {key: value.copy() if isinstance(value, (list, set, dict)) else value for key, value in info.items()}
+
+
+class GroupCommitter:
+
+    def __init__(self):
+        self.enabled = False
+        self.window = 0.005
+        self.max_batch = 50
+        self.timeout = 10
+        self.app = None
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("GROUP_COMMIT_ENABLED", False)
+        self.window = app.config.get("GROUP_COMMIT_WINDOW_MS", 5) / 1000
+        self.max_batch = app.config.get("GROUP_COMMIT_MAX_BATCH", 50)
+        self.timeout = app.config.get("GROUP_COMMIT_TIMEOUT", 10)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def submit(self, job):
+        """Encola job y espera su resultado (o la excepcion que levanto).
+
+        GroupCommitTimeout solo si el trabajo todavia no habia empezado y se pudo
+        cancelar: si ya esta en un lote se espera a que termine, para no
+        responder un error por una orden que igual se confirma.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        future = Future()
+        self._queue.put((job, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise GroupCommitTimeout()
+            return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self.app.app_context():
+                try:
+                    self._flush(batch)
+                except Exception as exc:  # pragma: no cover - error de la base en el commit
+                    db.session.rollback()
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                finally:
+                    db.session.remove()
+
+    def _flush(self, batch):
+        session = db.session()
+        done = []
+        for job, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            saved = copy_info(session.info)
+            try:
+                with session.begin_nested():
+                    result = job()
+            except Exception as exc:
+                session.info.clear()
+                session.info.update(saved)
+                future.set_exception(exc)
+            else:
+                done.append((job, future, result))
+
+        if done:
+            try:
+                session.commit() # Un solo commit (y un solo fsync) para todo el lote
+            except Exception:
+                # Ej: deadlock; se rehace cada trabajo con su propio commit
+                session.rollback()
+                done = self._one_by_one(done)
+        self.batches += 1
+        self.jobs += len(batch)
+        for _, future, result in done:
+            future.set_result(result)
+
+    def _one_by_one(self, done):
+        confirmed = []
+        for job, future, _ in done:
+            try:
+                result = job()
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                future.set_exception(exc)
+            else:
+                confirmed.append((job, future, result))
+        return confirmed
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else None,
+            "queued": self._queue.qsize()
+        }
+
+
+committer = GroupCommitter()
+
+
+def run_write(job, group=None):
+    """Ejecuta job (escrituras sin commit, devuelve la respuesta) y confirma.
+
+    Con group commit habilitado el trabajo va al hilo de commit; si no (o si la
+    request reservo un Idempotency-Key) corre en la sesion de la request con su
+    propio commit. Las excepciones de job se
+    propagan igual en los dos modos.
+    """
+    if group is None:
+        group = committer.enabled and not (has_request_context() and g.get("idempotency_claimed"))
+    if group:
+        return committer.submit(job)
+    try:
+        result = job()
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.commit()
+    return result
+
+
+def init_app(app):
+    committer.init_app(app)
@@ -0,0 +1,154 @@
+# Idempotency-Key para los POST que crean ordenes e items.
+#
+# La primera vez que llega una clave se inserta una fila "en curso" en
+# idempotency_keys dentro de la misma transaccion de la vista, asi la fila se
+# confirma junto con la orden creada (o desaparece con un rollback). Un
+# reintento con la misma clave choca con el indice unico (user_id, key) y
+# recibe la respuesta guardada, sin volver a validar ni escribir. Las
+# respuestas terminadas tambien quedan en una LRU por proceso, que responde
+# los reintentos sin ir a la base.
+#
+# Las respuestas 5xx no se guardan: el cliente puede reintentar con la misma clave.
+
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import request, jsonify, current_app, make_response, g
+from flask_jwt_extended import current_user
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .lru import LRUCache
+from .models import IdempotencyKey
+
+# (user_id, clave) -> (fingerprint, status, body), hasta que vence la clave
+response_cache = LRUCache(maxsize=4096, name="idempotency")
+
+HEADER = "Idempotency-Key"
+
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0" + request.path.encode() + b"\0")
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def replay(status_code, body):
+    response = current_app.response_class(body, status=status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def mismatch_response():
+    return jsonify({"msg": f"{HEADER} ya usada con otro request"}), 422
+
+
+def stored_response(user_id, key, fingerprint):
+    """Respuesta para una clave que ya existe en la tabla, o None si vencio"""
+    row = db.session.scalar(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    if row is None:
+        return None
+    if row.expires_at <= datetime.now():
+        db.session.delete(row)
+        db.session.commit()
+        return None
+    if row.fingerprint != fingerprint:
+        return mismatch_response()
+    if row.status_code is None:
+        # Otro request con la misma clave sigue en curso (o se corto despues de escribir)
+        return jsonify({"msg": "Hay un request con la misma clave en curso"}), 409, {"Retry-After": "1"}
+
+    response_cache.set((user_id, key), (fingerprint, row.status_code, row.body), expires_at=row.expires_at.timestamp())
+    return replay(row.status_code, row.body)
+
+
+def claim(user_id, key, fingerprint, ttl):
+    """Inserta la fila en curso en la transaccion actual; None si ya existia"""
+    row = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        fingerprint=fingerprint,
+        expires_at=datetime.now() + timedelta(seconds=ttl)
+    )
+    db.session.add(row)
+    try:
+        db.session.flush() # Un request concurrente con la misma clave espera aca al indice unico
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return row
+
+
+def idempotent(fn):
+    """Decorador para vistas POST autenticadas (va debajo de jwt_required)"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"msg": f"{HEADER} demasiado larga (maximo 255)"}), 400
+
+        user_id = current_user.id
+        fingerprint = request_fingerprint()
+        cached = response_cache.get((user_id, key))
+        if cached is not None:
+            if cached[0] != fingerprint:
+                return mismatch_response()
+            return replay(cached[1], cached[2])
+
+        ttl = current_app.config.get("IDEMPOTENCY_TTL_SECONDS", 86400)
+        row = None
+        for _ in range(2): # Una segunda vuelta si la clave existia pero estaba vencida
+            row = claim(user_id, key, fingerprint, ttl)
+            if row is not None:
+                break
+            existing = stored_response(user_id, key, fingerprint)
+            if existing is not None:
+                return existing
+        if row is None:
+            return jsonify({"msg": "Hay un request con la misma clave en curso"}), 409, {"Retry-After": "1"}
+        # La escritura tiene que ir en esta misma transaccion (ver run_write)
+        g.idempotency_claimed = True
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if response.status_code >= 500:
+            db.session.rollback()
+            # Si la vista ya habia hecho commit, se libera la clave para poder reintentar
+            db.session.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+            db.session.commit()
+            return response
+
+        # Si la vista hizo commit la fila ya esta confirmada y esto es un UPDATE; si
+        # respondio un error sin escribir (o hizo rollback) se inserta ya terminada
+        row.status_code = response.status_code
+        row.body = response.get_data(as_text=True)
+        db.session.add(row)
+        db.session.commit()
+        response_cache.set((user_id, key), (fingerprint, row.status_code, row.body),
+                           expires_at=row.expires_at.timestamp())
+        return response
+    return wrapper
+
+
+def purge():
+    """Borra las claves vencidas; devuelve cuantas"""
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now()))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_app(app):
+    response_cache.configure(app.config.get("IDEMPOTENCY_CACHE_SIZE", 4096))
@@ -0,0 +1,84 @@
+# Identidad del usuario autenticado a partir de los claims del JWT.
+#
+# UserLoginView guarda el rol en los claims, asi que id y rol salen del token sin
+# ir a la base. La fila de User solo se carga si una vista la pide (current_user.user),
+# como mucho una vez por request, y opcionalmente pasa por una LRU por proceso.
+
+from itertools import chain
+from types import SimpleNamespace
+
+from sqlalchemy import event, inspect
+
+from . import db, jwt
+from .lru import LRUCache
+from .models import User
+
+# Copias de solo lectura de filas de User, por id
+user_cache = LRUCache(name="users")
+
+
+class Identity:
+    """Usuario del token: id y rol de los claims, la fila de User a demanda"""
+
+    def __init__(self, id, role):
+        self.id = id
+        self.role = role
+        self._user = None
+        self._loaded = False
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+    @property
+    def user(self):
+        # Se guarda en la instancia, que vive en el contexto de la request
+        if not self._loaded:
+            self._user = load_user(self.id)
+            self._loaded = True
+        return self._user
+
+
+def load_user(user_id):
+    """Copia de solo lectura de la fila de User, o None si ya no existe"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    generation = user_cache.generation
+    row = db.session.get(User, user_id)
+    if row is None:
+        return None
+
+    user = SimpleNamespace(**{attr.key: getattr(row, attr.key) for attr in inspect(User).column_attrs})
+    user_cache.set(user_id, user, generation=generation)
+    return user
+
+
+@jwt.user_lookup_loader
+def identity_from_claims(jwt_header, jwt_data):
+    return Identity(int(jwt_data["sub"]), jwt_data.get("role"))
+
+
+# Invalidacion: los usuarios modificados o borrados salen de la cache al hacer commit
+
+@event.listens_for(db.session, "after_flush")
+def collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in chain(session.dirty, session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.pop(user_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_changed_users(session):
+    session.info.pop("changed_users", None)
+
+
+def init_app(app):
+    user_cache.configure(app.config.get("IDENTITY_CACHE_SIZE", 0), app.config.get("IDENTITY_CACHE_TTL"))
@@ -0,0 +1,104 @@
+# Proveedor JSON de la app (app.json, lo usa cada jsonify de app/views.py).
+#
+# El de Flask ordena las claves de cada dict, escapa todo lo que no es ASCII y
+# pasa las fechas por un hook Python que las escribe en formato HTTP (RFC 822).
+# FastJSONProvider no ordena, escribe UTF-8 tal cual (JSON_AS_ASCII) y las
+# fechas en ISO 8601, igual que los esquemas. Si orjson esta instalado lo usa
+# para armar las respuestas directamente en bytes; si no, usa json de la
+# biblioteca estandar con las mismas reglas.
+#
+# JSON_PROVIDER = "compat" vuelve al proveedor de Flask: la salida es byte a byte
+# la de antes (claves ordenadas, \uXXXX, fechas RFC 822).
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - depende del entorno
+    orjson = None
+
+PROVIDERS = ("fast", "compat")
+ENCODERS = ("auto", "orjson", "json")
+
+
+def _default(o):
+    """Tipos que json no conoce; las fechas en ISO 8601"""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+    def __init__(self, app, use_orjson=None):
+        super().__init__(app)
+        self.ensure_ascii = app.config.get("JSON_AS_ASCII", False)
+        if use_orjson is None:
+            use_orjson = orjson is not None
+        # orjson siempre escribe UTF-8: con JSON_AS_ASCII se usa json
+        self.use_orjson = use_orjson and not self.ensure_ascii
+        self.encoder = "orjson" if self.use_orjson else "json"
+
+    def _orjson_options(self, indent=False):
+        # Claves no str (ej: ids enteros) se convierten como lo hace json
+        options = orjson.OPT_NON_STR_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+        if "indent" not in kwargs:
+            kwargs.setdefault("separators", (",", ":"))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        if self.use_orjson:
+            body = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent)) + b"\n"
+        elif indent:
+            body = f"{super().dumps(obj, indent=2)}\n"
+        else:
+            body = f"{self.dumps(obj)}\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def make_provider(app, provider=None, encoder=None):
+    """Proveedor segun JSON_PROVIDER / JSON_ENCODER (o los argumentos)"""
+    provider = provider or app.config.get("JSON_PROVIDER", "fast")
+    encoder = encoder or app.config.get("JSON_ENCODER", "auto")
+    if provider not in PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER invalido: {provider} (opciones: {', '.join(PROVIDERS)})")
+    if encoder not in ENCODERS:
+        raise ValueError(f"JSON_ENCODER invalido: {encoder} (opciones: {', '.join(ENCODERS)})")
+    if provider == "compat":
+        return DefaultJSONProvider(app)
+    if encoder == "orjson" and orjson is None:
+        raise RuntimeError("JSON_ENCODER=orjson pero orjson no esta instalado")
+    return FastJSONProvider(app, use_orjson=None if encoder == "auto" else encoder == "orjson")
+
+
+def init_app(app):
+    app.json = make_provider(app)
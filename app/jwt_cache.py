@@ -0,0 +1,41 @@
+# JWTManager que guarda los claims ya verificados de cada token.
+#
+# Un mismo cliente manda el mismo token cientos de veces por minuto; en vez de
+# volver a verificar la firma HMAC cada vez, los claims quedan en una LRU por
+# proceso indexada por el token crudo hasta su `exp`. Solo entra a la cache un
+# token que paso la verificacion completa, asi que un hit equivale a verificarlo.
+# La revocacion y el tipo de token se siguen chequeando en cada request.
+# Con JWT_DECODE_CACHE_SIZE = 0 se desactiva.
+#
+# Depende de JWTManager._decode_jwt_from_config, que es privado: la version de
+# flask_jwt_extended esta fijada en requirements.txt y tests/test_jwt_cache.py
+# falla si la cache deja de usarse.
+
+from flask_jwt_extended import JWTManager
+
+from .lru import LRUCache
+
+
+class CachingJWTManager(JWTManager):
+
+    def __init__(self, app=None, add_context_processor=False):
+        self.token_cache = LRUCache(maxsize=0, name="jwt")
+        super().__init__(app, add_context_processor)
+
+    def init_app(self, app, add_context_processor=False):
+        super().init_app(app, add_context_processor)
+        self.token_cache.configure(app.config.get("JWT_DECODE_CACHE_SIZE", 0))
+        if self.token_cache.enabled and not hasattr(JWTManager, "_decode_jwt_from_config"):
+            app.logger.warning("flask_jwt_extended ya no tiene _decode_jwt_from_config: la cache de JWT no se usa")
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if allow_expired or csrf_value or not self.token_cache.enabled:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        claims = self.token_cache.get(encoded_token)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            if claims.get("exp"):
+                self.token_cache.set(encoded_token, claims, expires_at=claims["exp"])
+        # Copia: flask_jwt_extended guarda el dict en el contexto de la request
+        return dict(claims)
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Cache LRU por proceso con vencimiento, segura entre hilos.
+# Con maxsize=0 queda deshabilitada: get() siempre falla y set() no guarda nada.
+
+# Caches con nombre, para exponer sus contadores (ver CacheStatsView)
+caches = {}
+
+
+class LRUCache:
+
+    def __init__(self, maxsize=1024, ttl=None, name=None):
+        if name:
+            caches[name] = self
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Se incrementa en cada invalidacion; ver set(generation=...)
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize, ttl=None):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._data.clear()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key, default=None):
+        if not self.maxsize:
+            return default
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None, generation=None):
+        """Guarda value hasta expires_at (epoch) o hasta que venza el ttl.
+
+        Si se pasa generation y hubo una invalidacion desde que se leyo, no se
+        guarda: evita cachear un valor leido antes de un commit que lo cambio.
+        """
+        if not self.maxsize:
+            return
+        if expires_at is None and self.ttl:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self.generation += 1
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None
+            }
@@ -1,6 +1,17 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-from . import db
+from flask import current_app
+from . import db, hasher
+
+# Estados posibles de una orden
+ORDER_STATUSES = ("CREADO", "EN_PREPARACION", "LISTO", "ENTREGADO", "CANCELADO")
+# Cambios de estado permitidos en los cambios masivos (ver app/orders.py)
+ORDER_TRANSITIONS = {
+    "CREADO": ("EN_PREPARACION", "CANCELADO"),
+    "EN_PREPARACION": ("LISTO", "CANCELADO"),
+    "LISTO": ("ENTREGADO",),
+    "ENTREGADO": (),
+    "CANCELADO": (),
+}
 
 # Modelo de Usuario
 class User(db.Model):
@@ -13,11 +24,118 @@ class User(db.Model):
     phone = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    # El hash corre en el pool acotado de app.passwords (puede lanzar HasherBusy)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def rehash_password_later(self, password):
+        """Si el hash guardado no usa el metodo actual lo regenera en segundo plano"""
+        if not hasher.needs_rehash(self.password_hash):
+            return
+
+        app = current_app._get_current_object()
+        user_id, old_hash = self.id, self.password_hash
+
+        def store(new_hash):
+            with app.app_context():
+                try:
+                    # Solo si nadie cambio la contraseña mientras tanto
+                    User.query.filter_by(id=user_id, password_hash=old_hash).update(
+                        {"password_hash": new_hash}, synchronize_session=False
+                    )
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("No se pudo rehashear la contraseña del usuario %s", user_id)
+
+        hasher.rehash_later(password, store)
+
+# Tokens revocados antes de su vencimiento (logout). Se cargan en memoria en app/revocation.py
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+# Refresh tokens emitidos. Cada login abre una familia; al rotar se marca el usado
+# y si se vuelve a presentar uno ya usado se revoca la familia entera (ver app/tokens.py)
+class RefreshToken(db.Model):
+    __tablename__ = "refresh_tokens"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    family = db.Column(db.String(36), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    used_at = db.Column(db.DateTime, nullable=True)
+    revoked = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+# Estados de un pedido aceptado con 202 (ver app/submissions.py)
+# FALLIDA: error inesperado en ORDER_ASYNC_MAX_ATTEMPTS intentos seguidos
+SUBMISSION_STATUSES = ("PENDIENTE", "CREADA", "RECHAZADA", "FALLIDA")
+
+# Cola durable de ordenes aceptadas sin esperar a crearlas
+class OrderSubmission(db.Model):
+    __tablename__ = "order_submissions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    menu_day_id = db.Column(db.Integer, nullable=False)
+    # Items pedidos, en JSON: [{"product_id", "quantity"}]
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum(*SUBMISSION_STATUSES), default="PENDIENTE", nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    # Respuesta de error (JSON) si la orden se rechazo al crearla
+    error = db.Column(db.Text, nullable=True)
+    # Intentos que terminaron en un error inesperado (no un OrderError)
+    attempts = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    # Los workers toman las pendientes en orden de llegada
+    __table_args__ = (db.Index("ix_order_submissions_status_id", "status", "id"),)
+
+# Respuestas guardadas por Idempotency-Key, para reintentos de POST (ver app/idempotency.py)
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # sha256 de metodo, ruta y body: la misma clave con otro request es un error
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # Sin status_code el request todavia esta en curso
+    status_code = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+# Version de cada tabla del catalogo: se incrementa en el mismo flush que la
+# modifica y se usa para los ETag / Last-Modified de los GET (ver app/versions.py)
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+# Buckets de intentos de login cuando LOGIN_RATE_BACKEND = "db" (ver app/ratelimit.py)
+class LoginBucket(db.Model):
+    __tablename__ = "login_buckets"
+
+    key = db.Column(db.String(120), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False) # epoch en segundos
 
 # tabla productos para el menu
 class Product(db.Model):
@@ -29,7 +147,13 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     active = db.Column(db.Boolean, default=True)
     image_url = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    # Control de concurrencia optimista: cada UPDATE lo incrementa y exige el valor leido
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    # Indices para la paginacion por (created_at, id), ver app/pagination.py
+    __table_args__ = (db.Index("ix_products_created_at_id", "created_at", "id"),)
+    __mapper_args__ = {"version_id_col": version}
 
 # tabla menu del dia para gestionar los menus diarios
 class MenuDay(db.Model):
@@ -38,10 +162,12 @@ class MenuDay(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, unique=True, nullable=False)
     is_open = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default= datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (db.Index("ix_menu_days_created_at_id", "created_at", "id"),)
 
     # Relacion con MenuItem
-    items = db.relationship("MenuItem", backref="menu_day", cascade="all, delete-orphan")
+    items = db.relationship("MenuItem", back_populates="menu_day", cascade="all, delete-orphan")
     # Relacion con Order
     orders = db.relationship("Order", back_populates="menu_day")
 
@@ -52,11 +178,25 @@ class MenuItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     menu_day_id = db.Column(db.Integer, db.ForeignKey("menu_days.id"), nullable=False)
     products_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    # Porciones disponibles para el dia; NULL es sin limite (ver app/stock.py)
+    capacity = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (db.Index("ix_menu_items_menu_day_created_at_id", "menu_day_id", "created_at", "id"),)
 
     # Relacion con Product
     product = db.relationship("Product")
     menu_day = db.relationship("MenuDay", back_populates="items")
+    stock = db.relationship("MenuItemStock", cascade="all, delete-orphan")
+
+# Porciones que le quedan a un item del menu, repartidas en varias filas (shards)
+# para que las ordenes concurrentes del mismo plato no bloqueen la misma fila
+class MenuItemStock(db.Model):
+    __tablename__ = "menu_item_stock"
+
+    menu_item_id = db.Column(db.Integer, db.ForeignKey("menu_items.id", ondelete="CASCADE"), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    remaining = db.Column(db.Integer, nullable=False)
 
 # Tabla ordenes realizadas por los usuarios
 class Order(db.Model):
@@ -66,20 +206,28 @@ class Order(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     menu_day_id = db.Column(db.Integer, db.ForeignKey("menu_days.id"), nullable=False)
     total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.Enum("CREADO", "EN_PREPARACION", "LISTO", "ENTREGADO", "CANCELADO"), default="CREADO", nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    status = db.Column(db.Enum(*ORDER_STATUSES), default="CREADO", nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    # Control de concurrencia optimista (ETag / If-Match). Los UPDATE masivos de
+    # app/orders.py tambien lo incrementan
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        db.Index("ix_orders_created_at_id", "created_at", "id"),
+        db.Index("ix_orders_user_created_at_id", "user_id", "created_at", "id"),
+        # Planilla de produccion: ordenes de un dia agrupadas por estado
+        db.Index("ix_orders_menu_day_status", "menu_day_id", "status"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
     # Relacion con User
     user = db.relationship("User", backref="orders")
     # Relacion con MenuDay
     menu_day = db.relationship("MenuDay", back_populates="orders")
     # Relacion con OrderItem
-    items = db.relationship("OrderItem", backref="order", cascade="all, delete-orphan")
+    items = db.relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
-    def calculate_total_price(self):
-        """Calcula y actualiza el total de la orden sumando todos los items"""
-        self.total_price = sum(item.price for item in self.items)
-        return self.total_price
+    # El total se mantiene con deltas atomicos, ver app/orders.py (adjust_total)
 
 # Tabla order items que relaciona productos con las ordenes realizadas
 class OrderItem(db.Model): 
@@ -90,7 +238,13 @@ class OrderItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     price = db.Column(db.Float, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_order_items_order_created_at_id", "order_id", "created_at", "id"),
+        # Cubre la suma de la planilla de produccion sin leer la tabla
+        db.Index("ix_order_items_order_product", "order_id", "product_id", "quantity", "price"),
+    )
 
     # Relacion con orden
     order = db.relationship("Order", back_populates="items")
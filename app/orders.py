@@ -0,0 +1,223 @@
+# Logica de escritura de ordenes compartida por las vistas.
+
+from collections import Counter
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import select, insert, update, func
+
+from . import db
+from .models import Product, MenuItem, Order, OrderItem, ORDER_TRANSITIONS
+from .production import mark_changed
+from .events import order_event, queue_events
+from .stock import OutOfStock, take, take_products, release_orders
+from .schemas import OrderSchema, OrderItemSchema
+from .serializers import compiled
+
+
+class OrderError(Exception):
+    """Error de validacion de una orden; se responde con msg y status"""
+
+    def __init__(self, msg, status=400, **extra):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+        self.extra = extra
+
+    def response(self):
+        return jsonify({"msg": self.msg, **self.extra}), self.status
+
+
+def prepare_items(menu_day_id, items):
+    """Valida los items de una orden y calcula su precio.
+
+    Existencia, estado activo y pertenencia al menu del dia se chequean para todos
+    los productos a la vez, con una consulta IN cada uno. Devuelve las filas listas
+    para insertar en order_items (sin order_id).
+    """
+    product_ids = {item["product_id"] for item in items}
+
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids))}
+    missing = sorted(product_ids - products.keys())
+    if missing:
+        raise OrderError("Producto no encontrado", 404, product_ids=missing)
+
+    inactive = sorted(pid for pid, product in products.items() if not product.active)
+    if inactive:
+        raise OrderError("Producto no disponible", 400, product_ids=inactive)
+
+    in_menu = set(db.session.scalars(
+        select(MenuItem.products_id).where(
+            MenuItem.menu_day_id == menu_day_id,
+            MenuItem.products_id.in_(product_ids)
+        )
+    ))
+    not_in_menu = sorted(product_ids - in_menu)
+    if not_in_menu:
+        raise OrderError("Este producto no está en el menú del día de la orden", 400, product_ids=not_in_menu)
+
+    return [{
+        "product_id": item["product_id"],
+        "quantity": item["quantity"],
+        "price": products[item["product_id"]].price * item["quantity"] # Precio total del item
+    } for item in items]
+
+
+def create_order(user_id, menu_day_id, rows):
+    """Inserta la orden y sus items (ya validados) en la transaccion actual.
+
+    Primero descuenta las porciones de los items con cupo (OrderError 409 si no
+    alcanzan). Los items van en un solo INSERT executemany y el total se calcula
+    una vez. No hace commit.
+    """
+    quantities = Counter()
+    for row in rows:
+        quantities[row["product_id"]] += row["quantity"]
+    try:
+        take_products(menu_day_id, quantities)
+    except OutOfStock as err:
+        raise OrderError(err.msg, 409, product_ids=err.product_ids, **err.extra)
+
+    order = Order(
+        user_id=user_id,
+        menu_day_id=menu_day_id,
+        total_price=sum(row["price"] for row in rows),
+        status="CREADO"
+    )
+    db.session.add(order)
+    db.session.flush() # Para obtener el id de la orden
+
+    if rows:
+        now = datetime.now()
+        db.session.execute(insert(OrderItem), [{**row, "order_id": order.id, "created_at": now} for row in rows])
+    return order
+
+
+def place_order(user_id, menu_day_id, rows):
+    """Crea la orden y devuelve su serializacion (escrituras para run_write, sin commit)"""
+    order = create_order(user_id, menu_day_id, rows)
+    # Se serializa antes del commit para no recargar la orden
+    result = compiled(OrderSchema).dump(order)
+    result["items"] = compiled(OrderItemSchema).dump_many(
+        OrderItem.query.filter_by(order_id=order.id).order_by(OrderItem.id).all()
+    )
+    return result
+
+
+def add_item(order_id, product_id, quantity, price, menu_item_id=None, expected_version=None):
+    """Agrega un item ya validado a la orden y devuelve su serializacion (sin commit).
+
+    Con menu_item_id descuenta las porciones de ese item del menu. Recibe solo
+    valores, no objetos de la request, para poder correr en el hilo de group commit.
+    """
+    if menu_item_id is not None:
+        take(menu_item_id, quantity, product_id)
+    item = OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, price=price)
+    db.session.add(item)
+    # Sumar el item al total de la orden (UPDATE atomico, sin recargar los items)
+    adjust_total(order_id, price, expected_version)
+    return compiled(OrderItemSchema).dump(item)
+
+
+def bulk_transition(from_status, to_status, menu_day_id=None, order_ids=None):
+    """Pasa de from_status a to_status las ordenes de un menu del dia o de una lista.
+
+    Las ordenes candidatas se leen con FOR UPDATE y se cambian con un solo
+    UPDATE ... WHERE status = :from, en la transaccion actual (no hace commit).
+    Devuelve (ids actualizados, ids inexistentes, {id: estado} de las salteadas).
+    """
+    if to_status not in ORDER_TRANSITIONS[from_status]:
+        allowed = ", ".join(ORDER_TRANSITIONS[from_status]) or "ninguno"
+        raise OrderError(f"No se puede pasar de {from_status} a {to_status} (permitidos: {allowed})", 400)
+
+    query = select(Order.id, Order.status, Order.user_id, Order.menu_day_id, Order.version).with_for_update()
+    if order_ids is not None:
+        query = query.where(Order.id.in_(set(order_ids)))
+    else:
+        query = query.where(Order.menu_day_id == menu_day_id, Order.status == from_status)
+    rows = db.session.execute(query).all()
+    current = {row.id: row.status for row in rows}
+
+    matched = sorted(order_id for order_id, status in current.items() if status == from_status)
+    wrong_status = {order_id: status for order_id, status in current.items() if status != from_status}
+    missing = sorted(set(order_ids) - current.keys()) if order_ids is not None else []
+
+    if matched:
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_(matched), Order.status == from_status)
+            .values(status=to_status, version=Order.version + 1),
+            execution_options={"synchronize_session": False}
+        )
+        mark_changed(db.session)
+        if to_status == "CANCELADO":
+            release_orders(matched) # Las canceladas devuelven sus porciones
+        # El UPDATE no pasa por el flush: los eventos del stream se encolan a mano
+        queue_events(db.session, [
+            order_event(row.id, row.user_id, row.menu_day_id, to_status, row.version + 1)
+            for row in rows if row.status == from_status
+        ])
+    return matched, missing, wrong_status
+
+
+def adjust_total(order_id, delta, expected_version=None):
+    """Suma delta al total de la orden con un UPDATE atomico e incrementa su version.
+
+    No carga los items ni depende del total leido por la request: dos cambios
+    concurrentes sobre la misma orden suman sus deltas en vez de pisarse. Si se
+    pasa expected_version (el If-Match del cliente) y la orden cambio desde
+    entonces, da OrderError 409.
+    """
+    stmt = (
+        update(Order)
+        .where(Order.id == order_id)
+        .values(total_price=Order.total_price + delta, version=Order.version + 1)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Order.version == expected_version)
+    if db.session.execute(stmt).rowcount == 0:
+        raise OrderError("La orden fue modificada por otro usuario, volver a cargarla", 409)
+
+
+def items_total(order_id_column):
+    """Subconsulta correlacionada con la suma de los items de la orden"""
+    return (
+        select(func.coalesce(func.sum(OrderItem.price), 0))
+        .where(OrderItem.order_id == order_id_column)
+        .scalar_subquery()
+    )
+
+
+def recalculate_totals(order_ids):
+    """Recalcula en SQL el total de las ordenes indicadas (sin cargarlas en Python)"""
+    db.session.execute(
+        update(Order).where(Order.id.in_(order_ids))
+        .values(total_price=items_total(Order.id), version=Order.version + 1),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def find_drifted_totals(after_id, batch_size, tolerance=0.005):
+    """Busca ordenes cuyo total no coincide con la suma de sus items.
+
+    Recorre las ordenes por id en lotes de batch_size; devuelve
+    (ultimo id del lote, [(id, total guardado, total de los items)]).
+    """
+    ids = db.session.scalars(
+        select(Order.id).where(Order.id > after_id).order_by(Order.id).limit(batch_size)
+    ).all()
+    if not ids:
+        return None, []
+
+    sums = (
+        select(OrderItem.order_id, func.sum(OrderItem.price).label("total"))
+        .where(OrderItem.order_id.between(ids[0], ids[-1]))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(Order.id, Order.total_price, func.coalesce(sums.c.total, 0))
+        .outerjoin(sums, sums.c.order_id == Order.id)
+        .where(Order.id.between(ids[0], ids[-1]))
+    ).all()
+    return ids[-1], [row for row in rows if abs(row[1] - row[2]) > tolerance]
@@ -0,0 +1,162 @@
+# Paginacion por cursor y filtros para las vistas de listado.
+#
+# Los listados se ordenan por (created_at, id) y se cortan con un cursor de tipo
+# keyset: el cursor es la ultima fila de la pagina, y la siguiente arranca despues
+# de ella usando el indice compuesto, asi que el costo no crece con la tabla.
+# created_at es NOT NULL en las tablas paginadas: una fila sin fecha no cumpliria
+# la condicion del cursor y no saldria en ninguna pagina.
+# El body sigue siendo la lista de siempre; el cursor de la pagina siguiente va en
+# el header X-Next-Cursor (y en Link rel="next"). Toda respuesta tiene un tope:
+# sin limit se usa PAGINATION_DEFAULT_LIMIT, y nunca mas que PAGINATION_MAX_LIMIT.
+# Cambio para los clientes de antes de paginar: un listado mas largo que el tope
+# ya no llega completo, hay que seguir X-Next-Cursor.
+
+import base64
+import binascii
+import json
+from datetime import datetime, date, time
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class PaginationError(Exception):
+    """Parametro de paginacion o filtro invalido; msg va en la respuesta 400"""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+        self.msg = msg
+
+
+def encode_cursor(obj):
+    raw = json.dumps([obj.created_at.isoformat(), obj.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, obj_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(obj_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise PaginationError("Cursor invalido")
+
+
+# Filtros: cada uno recibe la query y el valor crudo del query string
+
+def parse_bool(name, value):
+    if value.lower() in ("1", "true", "si"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise PaginationError(f"Valor invalido para {name}")
+
+
+def parse_date(name, value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"Fecha invalida para {name} (formato AAAA-MM-DD)")
+
+
+def equals(column, cast=int):
+    def apply(query, name, value):
+        try:
+            return query.filter(column == cast(value))
+        except ValueError:
+            raise PaginationError(f"Valor invalido para {name}")
+    return apply
+
+
+def one_of(column, choices):
+    def apply(query, name, value):
+        if value not in choices:
+            raise PaginationError(f"{name} debe ser uno de: {', '.join(choices)}")
+        return query.filter(column == value)
+    return apply
+
+
+def boolean(column):
+    def apply(query, name, value):
+        return query.filter(column == parse_bool(name, value))
+    return apply
+
+
+def since(column):
+    def apply(query, name, value):
+        day = parse_date(name, value)
+        if column.type.python_type is datetime:
+            return query.filter(column >= datetime.combine(day, time.min))
+        return query.filter(column >= day)
+    return apply
+
+
+def until(column):
+    # Hasta el dia inclusive
+    def apply(query, name, value):
+        day = parse_date(name, value)
+        if column.type.python_type is datetime:
+            return query.filter(column <= datetime.combine(day, time.max))
+        return query.filter(column <= day)
+    return apply
+
+
+def created_range(model):
+    return {"created_from": since(model.created_at), "created_to": until(model.created_at)}
+
+
+def parse_limit(value):
+    """Limite de la pagina: el pedido o el por defecto, nunca mas que PAGINATION_MAX_LIMIT"""
+    default = current_app.config.get("PAGINATION_DEFAULT_LIMIT", 50)
+    maximum = current_app.config.get("PAGINATION_MAX_LIMIT", 200)
+    if value is None:
+        return max(1, min(default, maximum))
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError("limit debe ser un numero")
+    if limit < 1:
+        raise PaginationError("limit debe ser mayor a 0")
+    return min(limit, maximum)
+
+
+def paginate(query, model, filters=None, params=()):
+    """Aplica filtros, cursor y limit del query string; devuelve (items, next_cursor).
+
+    Solo se aceptan los filtros de `filters` y los parametros extra de `params`
+    (que la vista maneja por su cuenta); cualquier otro da PaginationError.
+    """
+    filters = filters or {}
+    for name, value in request.args.items():
+        if name in ("limit", "cursor") or name in params:
+            continue
+        if name not in filters:
+            raise PaginationError(f"Filtro no permitido: {name}")
+        query = filters[name](query, name, value)
+
+    limit = parse_limit(request.args.get("limit"))
+    cursor = request.args.get("cursor")
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at > created_at,
+            and_(model.created_at == created_at, model.id > last_id)
+        ))
+
+    items = query.order_by(model.created_at, model.id).limit(limit + 1).all()
+    if len(items) > limit:
+        return items[:limit], encode_cursor(items[limit - 1])
+    return items, None
+
+
+def page_headers(next_cursor):
+    """Headers con el cursor de la pagina siguiente (vacio si es la ultima)"""
+    if not next_cursor:
+        return {}
+    args = request.args.to_dict()
+    args["cursor"] = next_cursor
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    }
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Pool acotado para hashear y verificar contraseñas fuera del hilo de la request.
+# hashlib.scrypt y hashlib.pbkdf2_hmac liberan el GIL, asi que alcanza con hilos:
+# el limite real es la cantidad de nucleos que le dejamos al hashing. Las requests
+# admitidas (hasheando o en cola) se limitan por debajo de los hilos del servidor
+# (ver PASSWORD_HASH_MAX_IN_FLIGHT en config.py), para que sobre uno que responda 503.
+
+
+def hash_method(pwhash):
+    """Devuelve el metodo con sus parametros, ej: 'scrypt:32768:8:1'"""
+    return pwhash.split("$", 1)[0]
+
+
+def hash_cost(method):
+    """(algoritmo, costo) de un metodo; el costo solo se compara dentro del mismo algoritmo.
+
+    scrypt:N:r:p -> N*r*p, pbkdf2:hash:iteraciones -> iteraciones.
+    """
+    algorithm, *params = method.split(":")
+    if algorithm == "scrypt" and len(params) == 3:
+        n, r, p = map(int, params)
+        return algorithm, n * r * p
+    if algorithm == "pbkdf2" and len(params) == 2:
+        return f"{algorithm}:{params[0]}", int(params[1])
+    return method, 0
+
+
+def read_method_file(path):
+    """Metodo guardado por `flask passwords calibrate`, o None"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_method_file(path, method):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(method + "\n")
+    os.replace(tmp, path)
+
+
+def time_verify(method, rounds=2, limit=None):
+    """Mide en segundos la mejor de `rounds` verificaciones con `method`.
+
+    Generar el hash cuesta lo mismo que verificarlo, asi que cuenta como primera
+    muestra; si ya supera `limit` no se sigue midiendo.
+    """
+    start = time.perf_counter()
+    pwhash = generate_password_hash("calibracion", method)
+    best = time.perf_counter() - start
+    for _ in range(rounds):
+        if limit is not None and best > limit:
+            break
+        start = time.perf_counter()
+        check_password_hash(pwhash, "calibracion")
+        best = min(best, time.perf_counter() - start)
+    return hash_method(pwhash), best
+
+
+def calibrate(candidates, target_ms):
+    """Elige el candidato mas costoso cuya verificacion no supera target_ms.
+
+    Los candidatos van ordenados de menor a mayor costo; el primero es el piso,
+    se usa aunque la maquina sea mas lenta que el objetivo.
+    """
+    chosen = None
+    for candidate in candidates:
+        method, elapsed = time_verify(candidate, limit=target_ms / 1000)
+        if chosen is not None and elapsed * 1000 > target_ms:
+            break
+        chosen = method
+    return chosen
+
+
+def method_file(app):
+    return app.config.get("PASSWORD_HASH_METHOD_FILE") or os.path.join(app.instance_path, "password_hash_method")
+
+
+class HasherBusy(Exception):
+    """El pool de hashing esta lleno, la request tiene que responder 503"""
+
+
+class PasswordHasher:
+
+    def __init__(self, app=None):
+        self.workers = os.cpu_count() or 2
+        self.max_in_flight = 4
+        self.retry_after = 2
+        self.method = "scrypt"
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_in_flight = app.config.get("PASSWORD_HASH_MAX_IN_FLIGHT", self.max_in_flight)
+        # Mas hilos de hashing que requests admitidas no sirven de nada
+        self.workers = min(app.config.get("PASSWORD_HASH_WORKERS", self.workers), self.max_in_flight)
+        threads = app.config.get("SERVER_THREADS")
+        if threads and self.max_in_flight >= threads:
+            app.logger.warning(
+                "PASSWORD_HASH_MAX_IN_FLIGHT (%s) no es menor que SERVER_THREADS (%s): "
+                "el hashing puede ocupar todos los hilos del servidor", self.max_in_flight, threads
+            )
+        self.retry_after = app.config.get("PASSWORD_HASH_RETRY_AFTER", self.retry_after)
+
+        # La calibracion se corre una sola vez (`flask passwords calibrate`) y todos
+        # los procesos usan el mismo metodo: el de la config o el que guardo ese comando
+        method = app.config.get("PASSWORD_HASH_METHOD") or read_method_file(method_file(app)) or self.method
+        method = hash_method(generate_password_hash("", method))
+        app.config["PASSWORD_HASH_METHOD"] = self.method = method
+        app.extensions["password_hasher"] = self
+
+    def _pool(self):
+        # El executor se crea recien en el primer uso para no arrancar hilos
+        # en procesos que nunca hashean (CLI, migraciones)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._slots = threading.BoundedSemaphore(self.max_in_flight)
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="password-hash"
+                    )
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola fn en el pool o lanza HasherBusy si ya hay demasiadas tareas"""
+        executor = self._pool()
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return self.submit(generate_password_hash, password, self.method).result()
+
+    def verify(self, pwhash, password):
+        return self.submit(check_password_hash, pwhash, password).result()
+
+    def needs_rehash(self, pwhash):
+        """Solo si el hash es de otro algoritmo o mas barato que el metodo actual.
+
+        Un hash mas costoso (ej: hecho en una maquina calibrada mas alto) se deja.
+        """
+        algorithm, cost = hash_cost(hash_method(pwhash))
+        current_algorithm, current_cost = hash_cost(self.method)
+        return algorithm != current_algorithm or cost < current_cost
+
+    def rehash_later(self, password, store):
+        """Genera el hash con el metodo actual en el pool y llama a store(nuevo_hash).
+
+        Si el pool esta lleno no se hace nada: se vuelve a intentar en el proximo login.
+        """
+        def task():
+            store(generate_password_hash(password, self.method))
+        try:
+            return self.submit(task)
+        except HasherBusy:
+            return None
@@ -0,0 +1,131 @@
+# Planilla de produccion de la cocina: cuanto hay que preparar de cada producto
+# para un menu del dia.
+#
+# Se calcula en una sola consulta: GROUP BY (producto, estado) sobre order_items
+# unido a orders, usando los indices ix_orders_menu_day_status y
+# ix_order_items_order_product; los nombres de los productos se unen despues de
+# agrupar. Una vez que el menu del dia se cierra (is_open = False) el resultado
+# se guarda en una cache por proceso, que se vacia al hacer commit de cualquier
+# cambio en ordenes, items, productos o menus. Los estados de las ordenes siguen
+# cambiando con el dia cerrado (EN_PREPARACION -> LISTO -> ENTREGADO) y los
+# commits de otros procesos no vacian esta cache: cada planilla dura como mucho
+# PRODUCTION_CACHE_TTL segundos.
+
+from itertools import chain
+
+from sqlalchemy import select, func, event
+
+from . import db
+from .lru import LRUCache
+from .models import Product, MenuDay, Order, OrderItem, ORDER_STATUSES
+
+# Planillas de menus del dia cerrados, por menu_day_id
+production_cache = LRUCache(maxsize=256, ttl=30, name="production")
+
+# Estados que no cuentan para los totales a preparar
+EXCLUDED_STATUSES = ("CANCELADO",)
+
+
+def production_rows(menu_day_id):
+    """(product_id, nombre, estado, cantidad, monto, ordenes) por producto y estado"""
+    grouped = (
+        select(
+            OrderItem.product_id,
+            Order.status,
+            func.sum(OrderItem.quantity).label("quantity"),
+            func.sum(OrderItem.price).label("revenue"),
+            func.count(func.distinct(Order.id)).label("orders"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.menu_day_id == menu_day_id)
+        .group_by(OrderItem.product_id, Order.status)
+        .subquery()
+    )
+    return db.session.execute(
+        select(
+            grouped.c.product_id, Product.name, grouped.c.status,
+            grouped.c.quantity, grouped.c.revenue, grouped.c.orders
+        )
+        .join(Product, Product.id == grouped.c.product_id)
+        .order_by(Product.name, grouped.c.product_id)
+    ).all()
+
+
+def build_sheet(menu_day, rows):
+    products = {}
+    totals = {"quantity": 0, "revenue": 0.0}
+    for product_id, name, status, quantity, revenue, orders in rows:
+        entry = products.setdefault(product_id, {
+            "product_id": product_id,
+            "name": name,
+            "quantity": 0,
+            "revenue": 0.0,
+            "by_status": {},
+        })
+        entry["by_status"][status] = {"quantity": int(quantity), "revenue": round(revenue, 2), "orders": orders}
+        if status not in EXCLUDED_STATUSES:
+            entry["quantity"] += int(quantity)
+            entry["revenue"] += revenue
+            totals["quantity"] += int(quantity)
+            totals["revenue"] += revenue
+
+    for entry in products.values():
+        entry["revenue"] = round(entry["revenue"], 2)
+        # Mismo orden de estados que el flujo de la orden
+        entry["by_status"] = {s: entry["by_status"][s] for s in ORDER_STATUSES if s in entry["by_status"]}
+    totals["revenue"] = round(totals["revenue"], 2)
+
+    return {
+        "menu_day_id": menu_day.id,
+        "date": menu_day.date.isoformat(),
+        "is_open": menu_day.is_open,
+        "products": list(products.values()),
+        "totals": totals,
+    }
+
+
+def production_sheet(menu_day):
+    """Planilla del menu del dia; devuelve (planilla, si salio de la cache)"""
+    closed = menu_day.is_open is False
+    if closed:
+        sheet = production_cache.get(menu_day.id)
+        if sheet is not None:
+            return sheet, True
+
+    generation = production_cache.generation
+    sheet = build_sheet(menu_day, production_rows(menu_day.id))
+    if closed:
+        production_cache.set(menu_day.id, sheet, generation=generation)
+    return sheet, False
+
+
+# Invalidacion: cualquier cambio en las tablas de la planilla vacia la cache al hacer commit.
+# Son pocas entradas y solo de dias cerrados, asi que no vale la pena ubicar el dia exacto.
+
+WATCHED = (Order, OrderItem, Product, MenuDay)
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_production_changes(session, flush_context):
+    if any(isinstance(obj, WATCHED) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["production_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_production(session):
+    if session.info.pop("production_changed", False):
+        production_cache.clear()
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_production_changes(session):
+    session.info.pop("production_changed", None)
+
+
+def mark_changed(session):
+    """Para cambios hechos con UPDATE masivos, que no pasan por el flush"""
+    session.info["production_changed"] = True
+
+
+def init_app(app):
+    production_cache.configure(app.config.get("PRODUCTION_CACHE_SIZE", 256), app.config.get("PRODUCTION_CACHE_TTL", 30))
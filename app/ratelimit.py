@@ -0,0 +1,203 @@
+# Limite de intentos de login con token buckets por usuario y por IP.
+#
+# Cada intento consume un token del bucket de la IP y otro del usuario; los buckets
+# se recargan a una tasa fija. El chequeo se hace antes de buscar el usuario o
+# verificar la contraseña, asi que un intento rechazado no toca ni la tabla users
+# ni el pool de hashing.
+#
+# El bucket por IP usa request.remote_addr: detras de nginx u otro proxy hay que
+# configurar PROXY_FIX_X_FOR (ver create_app) o todos los clientes comparten la
+# IP del proxy.
+#
+# Backends (LOGIN_RATE_BACKEND):
+#   "shm"    tabla de buckets en un archivo mmap compartido por todos los procesos
+#            del nodo (por defecto en /dev/shm), con locks fcntl por slot
+#   "memory" dict por proceso (sin fcntl, ej: Windows)
+#   "db"     tabla login_buckets, para varios nodos detras de un balanceador
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import LoginBucket
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+def bucket_key(kind, value):
+    return f"{kind}:{value}"
+
+
+def refill(tokens, last, now, capacity, rate):
+    """Recarga el bucket y consume un token; devuelve (tokens, segundos de espera)"""
+    tokens = min(capacity, tokens + (now - last) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens, wait = refill(tokens, last, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+
+class SharedBuckets:
+    """Buckets en un archivo mmap de slots de tamaño fijo (hash de la clave, tokens, fecha).
+
+    El hash lleva SECRET_KEY como clave, asi no se puede buscar offline un
+    usuario que caiga junto a otro. Cada clave va a un grupo de WAYS slots
+    contiguos y ocupa uno libre o uno cuyo bucket ya se recargo entero (no se
+    pierde nada al pisarlo). Si los WAYS estan en uso, comparte el que tenga
+    menos tokens: una colision nunca devuelve un bucket lleno.
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    WAYS = 4
+
+    def __init__(self, path, slots, secret):
+        self.path = path
+        self.sets = max(1, slots // self.WAYS)
+        self.slots = self.sets * self.WAYS
+        self._hash_key = hashlib.sha256(secret.encode() if isinstance(secret, str) else secret).digest()
+        self._map = None
+        self._fd = None
+        self._open_lock = threading.Lock()
+        # Los locks fcntl son por proceso: entre hilos del mismo proceso se usan estos
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def _open(self):
+        with self._open_lock:
+            if self._map is None:
+                size = self.slots * self.SLOT.size
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+                self._fd = fd
+        return self._map
+
+    def _choose(self, shared, base, digest, capacity, rate, now):
+        """(offset, tokens, last) del slot de la clave dentro de su grupo"""
+        entries = []
+        for way in range(self.WAYS):
+            offset = base + way * self.SLOT.size
+            stored, tokens, last = self.SLOT.unpack_from(shared, offset)
+            if stored == digest:
+                return offset, tokens, last
+            entries.append((offset, stored, tokens, last))
+        for offset, stored, tokens, last in entries:
+            # Slot libre, o de una clave cuyo bucket ya esta lleno otra vez
+            if not stored or tokens + (now - last) * rate >= capacity:
+                return offset, capacity, now
+        offset, _, tokens, last = min(entries, key=lambda e: min(capacity, e[2] + (now - e[3]) * rate))
+        return offset, tokens, last
+
+    def consume(self, key, capacity, rate):
+        shared = self._map or self._open()
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8, key=self._hash_key).digest(), "little"
+        ) or 1
+        group = digest % self.sets
+        base = group * self.WAYS * self.SLOT.size
+        length = self.WAYS * self.SLOT.size
+
+        with self._locks[group % len(self._locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, base)
+            try:
+                now = time.time()
+                offset, tokens, last = self._choose(shared, base, digest, capacity, rate, now)
+                tokens, wait = refill(tokens, last, now, capacity, rate)
+                self.SLOT.pack_into(shared, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, base)
+        return wait
+
+
+class TableBuckets:
+    """Buckets en la tabla login_buckets; usa su propia conexion, no la sesion de la request"""
+
+    def consume(self, key, capacity, rate, retry=True):
+        now = time.time()
+        try:
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    select(LoginBucket.tokens, LoginBucket.updated_at)
+                    .where(LoginBucket.key == key)
+                    .with_for_update()
+                ).first()
+                tokens, last = row if row else (capacity, now)
+                tokens, wait = refill(tokens, last, now, capacity, rate)
+                if row:
+                    conn.execute(update(LoginBucket).where(LoginBucket.key == key)
+                                 .values(tokens=tokens, updated_at=now))
+                else:
+                    conn.execute(insert(LoginBucket).values(key=key, tokens=tokens, updated_at=now))
+            return wait
+        except IntegrityError:
+            # Otro proceso creo la fila al mismo tiempo
+            if not retry:
+                raise
+            return self.consume(key, capacity, rate, retry=False)
+
+
+class LoginLimiter:
+
+    def __init__(self):
+        self.enabled = True
+        self.backend = MemoryBuckets()
+        self.user_limit = (5, 5 / 60)
+        self.ip_limit = (30, 60 / 60)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("LOGIN_RATE_ENABLED", True)
+        self.user_limit = (app.config.get("LOGIN_RATE_USER_BURST", 5),
+                           app.config.get("LOGIN_RATE_USER_PER_MINUTE", 5) / 60)
+        self.ip_limit = (app.config.get("LOGIN_RATE_IP_BURST", 30),
+                         app.config.get("LOGIN_RATE_IP_PER_MINUTE", 60) / 60)
+
+        backend = app.config.get("LOGIN_RATE_BACKEND", "shm")
+        if backend == "db":
+            self.backend = TableBuckets()
+        elif backend == "shm" and fcntl is not None:
+            shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = app.config.get("LOGIN_RATE_SHM_PATH") or os.path.join(shm_dir, "api_viandas_login_buckets")
+            self.backend = SharedBuckets(path, app.config.get("LOGIN_RATE_SHM_SLOTS", 65536), app.config["SECRET_KEY"])
+        else:
+            self.backend = MemoryBuckets()
+
+    def hit(self, username, ip):
+        """Registra un intento; devuelve 0 si se permite o los segundos a esperar"""
+        if not self.enabled:
+            return 0
+        wait = self.backend.consume(bucket_key("ip", ip), *self.ip_limit)
+        if wait:
+            return wait
+        return self.backend.consume(bucket_key("user", username.strip().lower()), *self.user_limit)
+
+
+login_limiter = LoginLimiter()
+
+
+def init_app(app):
+    login_limiter.init_app(app)
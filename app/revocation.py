@@ -0,0 +1,86 @@
+# Revocacion de tokens (logout) sin consultar la base en cada request.
+#
+# Los jti revocados se guardan en la tabla revoked_tokens y cada proceso mantiene
+# un set en memoria. El set se actualiza de forma incremental cada
+# REVOCATION_REFRESH_SECONDS leyendo solo las filas nuevas, asi que el chequeo
+# normal es una busqueda en un set. Un token revocado en otro proceso puede seguir
+# siendo aceptado aca hasta el proximo refresco.
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+
+from . import db, jwt
+from .models import RevokedToken
+
+
+class RevocationStore:
+
+    def __init__(self):
+        self.refresh_interval = 30
+        self._revoked = {}  # jti -> vencimiento (epoch)
+        self._since = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        self.refresh()
+        return jti in self._revoked
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        # Si otro hilo ya esta refrescando se usa el set actual
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = now + self.refresh_interval
+            started = datetime.now()
+            query = select(RevokedToken.jti, RevokedToken.expires_at)
+            if self._since is not None:
+                query = query.where(RevokedToken.created_at >= self._since)
+            rows = db.session.execute(query).all()
+
+            epoch = time.time()
+            revoked = {jti: exp for jti, exp in list(self._revoked.items()) if exp > epoch}
+            for jti, expires_at in rows:
+                if expires_at.timestamp() > epoch:
+                    revoked[jti] = expires_at.timestamp()
+            self._revoked = revoked
+
+            # Se relee una ventana hacia atras por transacciones que hicieron
+            # commit despues de que otro proceso leyera la tabla
+            self._since = started - timedelta(seconds=2 * self.refresh_interval)
+        finally:
+            self._lock.release()
+
+    def revoke(self, jwt_data):
+        """Agrega el token a la tabla (hace falta commit) y al set de este proceso"""
+        exp = jwt_data["exp"]
+        db.session.add(RevokedToken(
+            jti=jwt_data["jti"],
+            user_id=int(jwt_data["sub"]),
+            expires_at=datetime.fromtimestamp(exp)
+        ))
+        self._revoked[jwt_data["jti"]] = exp
+
+    def purge(self):
+        """Borra de la tabla los tokens que ya vencieron; devuelve cuantos"""
+        result = db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now()))
+        db.session.commit()
+        return result.rowcount
+
+
+revocations = RevocationStore()
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_data):
+    return revocations.is_revoked(jwt_data["jti"])
+
+
+def init_app(app):
+    revocations.refresh_interval = app.config.get("REVOCATION_REFRESH_SECONDS", 30)
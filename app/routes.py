@@ -2,16 +2,19 @@
 
 from app.views import (
     # AUTH
-    UserRegisterView, UserLoginView, MeView,
+    UserRegisterView, UserLoginView, TokenRefreshView, UserLogoutView, MeView,
+
+    # ADMIN
+    CacheStatsView,
     
     # MENU
-    MenuDayListView, MenuDayDetailView, MenuItemListView, MenuItemDetailView,
+    MenuDayListView, MenuDayDetailView, MenuDayProductionView, MenuItemListView, MenuItemDetailView,
 
     # PRODUCTOS
     ProductListView, ProductDetailView,
 
     # ORDENES
-    OrderListView, OrderDetailView, OrderItemListView, OrderItemDetailView
+    OrderListView, OrderStatusBulkView, OrderStreamView, OrderSubmissionView, OrderDetailView, OrderItemListView, OrderItemDetailView
 )
 
 def register_routes(app):
@@ -19,13 +22,19 @@ def register_routes(app):
     # --- AUTH --- #
     app.add_url_rule("/auth/register", view_func= UserRegisterView.as_view("user_register"), methods=["POST"])
     app.add_url_rule("/auth/login", view_func= UserLoginView.as_view("user_login"), methods=["POST"])
+    app.add_url_rule("/auth/refresh", view_func= TokenRefreshView.as_view("token_refresh"), methods=["POST"])
+    app.add_url_rule("/auth/logout", view_func= UserLogoutView.as_view("user_logout"), methods=["POST"])
     app.add_url_rule("/auth/me", view_func= MeView.as_view("me"), methods=["GET"])
 
+    # --- ADMIN --- #
+    app.add_url_rule("/admin/caches", view_func= CacheStatsView.as_view("cache_stats"), methods=["GET"])
+
     # --- MENU --- #
     app.add_url_rule("/menu_days", view_func= MenuDayListView.as_view("menu_day_list"), methods=["GET", "POST"])
     app.add_url_rule("/menu_days/<int:menu_day_id>", view_func= MenuDayDetailView.as_view("menu_day_detail"), methods=["GET", "PUT", "DELETE"])
+    app.add_url_rule("/menu_days/<int:menu_day_id>/production", view_func= MenuDayProductionView.as_view("menu_day_production"), methods=["GET"])
     app.add_url_rule("/menu_items/<int:menu_day_id>", view_func= MenuItemListView.as_view("menu_item_list"), methods=["GET", "POST"])  
-    app.add_url_rule("/menu_items/<int:item_id>", view_func = MenuItemDetailView.as_view("menu_item_detail"), methods=["DELETE"])
+    app.add_url_rule("/menu_items/<int:item_id>", view_func = MenuItemDetailView.as_view("menu_item_detail"), methods=["PUT", "DELETE"])
 
     # --- PRODUCTOS --- #
     app.add_url_rule("/products", view_func= ProductListView.as_view("product_list"), methods=["GET", "POST"])
@@ -33,6 +42,9 @@ def register_routes(app):
 
     # --- ORDENES --- #
     app.add_url_rule("/orders", view_func= OrderListView.as_view("order_list"), methods=["GET", "POST"])
+    app.add_url_rule("/orders/submissions/<token>", view_func= OrderSubmissionView.as_view("order_submission"), methods=["GET"])
+    app.add_url_rule("/orders/stream", view_func= OrderStreamView.as_view("order_stream"), methods=["GET"])
+    app.add_url_rule("/orders/status", view_func= OrderStatusBulkView.as_view("order_status_bulk"), methods=["POST"])
     app.add_url_rule("/orders/<int:order_id>", view_func= OrderDetailView.as_view("order_detail"), methods=["GET", "PUT", "DELETE"])
     app.add_url_rule("/order_items/<int:order_id>", view_func= OrderItemListView.as_view("order_item_list"), methods=["GET", "POST"])
     app.add_url_rule("/order_items/<int:item_id>", view_func= OrderItemDetailView.as_view("order_item_detail"), methods=["DELETE", "PUT"])
@@ -1,4 +1,6 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+
+from .models import ORDER_STATUSES
 
 # Esquemas de validación y serialización con Marshmallow
 # Sirven para validar los datos de entrada y formatear los datos de salida en las respuestas JSON
@@ -20,6 +22,7 @@ class ProductSchema(Schema):
     active = fields.Bool(load_default=True)
     image_url = fields.Str(allow_none=True)
     created_at = fields.DateTime(dump_only=True)
+    version = fields.Int(dump_only=True)
 
 class MenuDaySchema(Schema):
 
@@ -33,23 +36,58 @@ class MenuItemSchema(Schema):
     id = fields.Int(dump_only=True)
     menu_day_id = fields.Int(required=True)
     products_id = fields.Int(required=True)
+    capacity = fields.Int(allow_none=True, validate=validate.Range(min=0))
     created_at = fields.DateTime(dump_only=True)
 
+# Variantes anidadas para ?expand= en los menus del dia (solo salida)
+class MenuItemWithProductSchema(MenuItemSchema):
+
+    product = fields.Nested(ProductSchema, dump_only=True)
+
+class MenuDayWithItemsSchema(MenuDaySchema):
+
+    items = fields.Nested(MenuItemSchema, many=True, dump_only=True)
+
+class MenuDayWithProductsSchema(MenuDaySchema):
+
+    items = fields.Nested(MenuItemWithProductSchema, many=True, dump_only=True)
+
+# Item dentro de POST /orders (la orden todavia no tiene id)
+class OrderItemInputSchema(Schema):
+
+    product_id = fields.Int(required=True)
+    quantity = fields.Int(required=True, validate=validate.Range(min=1))
+
 class OrderSchema(Schema):
 
     id = fields.Int(dump_only=True)
     user_id = fields.Int(required=True)
     menu_day_id = fields.Int(required=True)
     total_price = fields.Float(dump_only=True)
-    status = fields.Str(dump_only=True)
+    # Solo lo cambia un admin (OrderDetailView.put); al crear la orden se ignora
+    status = fields.Str(validate=validate.OneOf(ORDER_STATUSES))
     created_at = fields.DateTime(dump_only=True)
+    version = fields.Int(dump_only=True)
+    items = fields.List(fields.Nested(OrderItemInputSchema), load_only=True, validate=validate.Length(max=100))
 
 class OrderItemSchema(Schema):
 
     id = fields.Int(dump_only=True)
     order_id = fields.Int(required=True)
     product_id = fields.Int(required=True)
-    quantity = fields.Int(required=True)
+    quantity = fields.Int(required=True, validate=validate.Range(min=1))
     price = fields.Float(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
 
+# Cambio de estado masivo: por menu del dia o por lista de ordenes (uno de los dos)
+class OrderStatusBulkSchema(Schema):
+
+    from_status = fields.Str(required=True, data_key="from", validate=validate.OneOf(ORDER_STATUSES))
+    to_status = fields.Str(required=True, data_key="to", validate=validate.OneOf(ORDER_STATUSES))
+    menu_day_id = fields.Int()
+    order_ids = fields.List(fields.Int(), validate=validate.Length(min=1, max=1000))
+
+    @validates_schema
+    def validate_target(self, data, **kwargs):
+        if ("menu_day_id" in data) == ("order_ids" in data):
+            raise ValidationError("Indicar menu_day_id u order_ids (solo uno)")
@@ -0,0 +1,291 @@
+# Serializadores compilados para las respuestas de los GET.
+#
+# Schema.dump de marshmallow recorre los campos uno por uno en cada objeto:
+# busca el valor con un accessor generico, llama a Field.serialize y arma el
+# dict. En listados de cientos de filas es la mayor parte del tiempo de la vista.
+# Aca, la primera vez que se pide un esquema, se genera una funcion Python con
+# los campos escritos en linea (obj.price -> float(...), obj.created_at ->
+# isoformat(), etc.), asi cada fila es un solo dict literal.
+#
+# La salida tiene que ser identica a la de marshmallow, que sigue siendo la
+# referencia: `flask serializers bench` compara las dos. Los campos que no se
+# saben compilar usan su propio Field.serialize, y los esquemas con hooks
+# (pre_dump/post_dump) usan directamente Schema.dump.
+#
+# Solo para objetos (modelos); los dicts se siguen serializando con marshmallow.
+#
+# Para la entrada (POST/PUT de ordenes) hay cargadores compilados con la misma
+# idea: aceptan rapido el payload valido comun (tipos exactos de JSON, sin
+# campos de mas) y ante cualquier duda le pasan el dato a Schema.load, que arma
+# los mensajes de error (y convierte valores como "2" -> 2) igual que siempre.
+
+import math
+
+from marshmallow import fields, missing, RAISE, ValidationError
+from marshmallow.utils import ensure_text_type
+from marshmallow.validate import Validator
+
+from .schemas import (
+    ProductSchema, MenuDaySchema, MenuItemSchema, OrderSchema, OrderItemSchema,
+    MenuDayWithItemsSchema, MenuDayWithProductsSchema
+)
+
+# Esquemas que se compilan al arrancar (los que usan los GET de app/views.py)
+PRECOMPILED = (
+    ProductSchema, MenuDaySchema, MenuItemSchema, OrderSchema, OrderItemSchema,
+    MenuDayWithItemsSchema, MenuDayWithProductsSchema
+)
+
+
+def _expression(field, value, env, index):
+    """Expresion Python que serializa value como lo haria field, o None si no se sabe"""
+    kind = type(field)
+    if kind is fields.Integer and not field.as_string:
+        return f"({value} if {value}.__class__ is int else None if {value} is None else int({value}))"
+    if kind is fields.Float and not field.as_string:
+        return f"({value} if {value}.__class__ is float else None if {value} is None else float({value}))"
+    if kind is fields.String:
+        return f"({value} if {value}.__class__ is str else None if {value} is None else _text({value}))"
+    if kind in (fields.Boolean, fields.Raw):
+        return value
+    if kind in (fields.DateTime, fields.Date) and field.format in (None, "iso", "iso8601"):
+        return f"(None if {value} is None else {value}.isoformat())"
+    if kind is fields.Nested and isinstance(field.nested, type) and not (field.only or field.exclude):
+        env[f"_nested{index}"] = compiled(field.nested)
+        dump = f"_nested{index}.dump_many" if field.many else f"_nested{index}.dump"
+        return f"(None if {value} is None else {dump}({value}))"
+    return None
+
+
+def _has_dump_hooks(schema):
+    return any(schema._hooks[tag] for tag in ("pre_dump", "post_dump"))
+
+
+def compile_dump(schema):
+    """Genera la funcion obj -> dict equivalente a schema.dump(obj)"""
+    env = {"_text": ensure_text_type, "_missing": missing, "_get": schema.get_attribute, "_dump": schema.dump}
+    entries = [] # (clave, atributo, expresion o None)
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        attribute = field.attribute or name
+        key = field.data_key if field.data_key is not None else name
+        expression = None
+        if "." not in attribute and field.dump_default is missing:
+            expression = _expression(field, f"_v{index}", env, index)
+        if expression is None:
+            env[f"_field{index}"] = field
+        entries.append((key, name, attribute, expression))
+
+    lines = ["def dump(obj):"]
+    for index, (key, name, attribute, expression) in enumerate(entries):
+        if expression is not None:
+            lines.append(f"    _v{index} = obj.{attribute}")
+    if all(expression is not None for *_, expression in entries):
+        # Caso comun: un solo dict literal
+        body = ", ".join(f"{key!r}: {expression}" for key, _, _, expression in entries)
+        lines.append(f"    return {{{body}}}")
+    else:
+        lines.append("    result = {}")
+        for index, (key, name, attribute, expression) in enumerate(entries):
+            if expression is not None:
+                lines.append(f"    result[{key!r}] = {expression}")
+            else:
+                lines.append(f"    _v{index} = _field{index}.serialize({name!r}, obj, accessor=_get)")
+                lines.append(f"    if _v{index} is not _missing:")
+                lines.append(f"        result[{key!r}] = _v{index}")
+        lines.append("    return result")
+    # Objeto sin alguno de los atributos: marshmallow omite esas claves, asi que
+    # ese caso (raro con modelos) lo resuelve el propio esquema
+    lines[1:] = ["    try:"] + ["    " + line for line in lines[1:]] + [
+        "    except AttributeError:", "        return _dump(obj)"]
+
+    source = "\n".join(lines)
+    exec(compile(source, f"<serializer {type(schema).__name__}>", "exec"), env)
+    dump = env["dump"]
+    dump.source = source
+    return dump
+
+
+class Serializer:
+    """Serializacion de un esquema: dump(obj) y dump_many(objs)"""
+
+    def __init__(self, schema_class):
+        self.schema_class = schema_class
+        self.schema = schema_class()
+        if _has_dump_hooks(self.schema):
+            self.dump = self.schema.dump
+        else:
+            self.dump = compile_dump(self.schema)
+
+    def dump_many(self, objs):
+        return list(map(self.dump, objs))
+
+
+_compiled = {}
+
+
+def compiled(schema_class):
+    """Serializer (compilado una sola vez) del esquema"""
+    serializer = _compiled.get(schema_class)
+    if serializer is None:
+        serializer = _compiled[schema_class] = Serializer(schema_class)
+    return serializer
+
+
+# Cargadores compilados
+
+class _Fallback(Exception):
+    """El camino rapido no puede asegurar el resultado: decide marshmallow"""
+
+
+def _check_float(value):
+    if value.__class__ is float and math.isfinite(value):
+        return value
+    raise _Fallback()
+
+
+def _type_check(field, value):
+    """Condicion Python que es verdadera si value ya tiene el tipo final del campo, o None"""
+    kind = type(field)
+    if kind is fields.Integer:
+        return f"{value}.__class__ is int"
+    if kind is fields.String:
+        return f"{value}.__class__ is str"
+    if kind is fields.Boolean and field.truthy == fields.Boolean.truthy and field.falsy == fields.Boolean.falsy:
+        return f"({value} is True or {value} is False)"
+    return None
+
+
+def _sub_partial(partial, name):
+    if partial is None or partial is True:
+        return partial
+    prefix = name + "."
+    return tuple(key[len(prefix):] for key in partial if key.startswith(prefix))
+
+
+def _has_load_hooks(schema):
+    return any(schema._hooks[tag] for tag in ("pre_load", "post_load", "validates", "validates_schema"))
+
+
+def compile_load(schema, partial=None):
+    """Genera la funcion data -> dict del caso valido; levanta _Fallback si no aplica"""
+    env = {"_missing": missing, "_Fallback": _Fallback, "_float": _check_float}
+    keys = set()
+    lines = ["def load(data):", "    result = {}"]
+    for index, (name, field) in enumerate(schema.load_fields.items()):
+        key = field.data_key if field.data_key is not None else name
+        attribute = field.attribute or name
+        if "." in attribute:
+            return None
+        keys.add(key)
+        value = f"_v{index}"
+        skip_missing = partial is True or (partial is not None and name in partial)
+
+        lines.append(f"    {value} = data.get({key!r}, _missing)")
+        lines.append(f"    if {value} is _missing:")
+        if skip_missing:
+            lines.append("        pass")
+        elif field.required:
+            lines.append("        raise _Fallback()")
+        elif field.load_default is not missing:
+            env[f"_default{index}"] = field.load_default
+            default = f"_default{index}()" if callable(field.load_default) else f"_default{index}"
+            lines.append(f"        result[{attribute!r}] = {default}")
+        else:
+            lines.append("        pass")
+        if field.allow_none:
+            lines.append(f"    elif {value} is None:")
+            lines.append(f"        result[{attribute!r}] = None")
+        lines.append("    else:")
+
+        check = _type_check(field, value)
+        if check is not None:
+            lines.append(f"        if not ({check}):")
+            lines.append("            raise _Fallback()")
+        elif type(field) is fields.Float and not field.allow_nan:
+            lines.append(f"        {value} = _float({value})")
+        elif type(field) is fields.List and type(field.inner) is fields.Nested:
+            inner = field.inner
+            if not isinstance(inner.nested, type) or inner.only or inner.exclude or inner.many:
+                return None
+            env[f"_nested{index}"] = loader(inner.nested, _sub_partial(partial, key))._fast
+            lines.append(f"        if {value}.__class__ is not list:")
+            lines.append("            raise _Fallback()")
+            lines.append(f"        {value} = [_nested{index}(each) for each in {value}]")
+        else:
+            # Tipo sin camino rapido: el propio campo convierte y valida
+            env[f"_field{index}"] = field
+            lines.append(f"        {value} = _field{index}.deserialize({value}, {key!r}, data)")
+
+        for number, validator in enumerate(field.validators):
+            name_v = f"_validate{index}_{number}"
+            env[name_v] = validator
+            if isinstance(validator, Validator):
+                lines.append(f"        {name_v}({value})")
+            else:
+                lines.append(f"        if {name_v}({value}) is False:")
+                lines.append("            raise _Fallback()")
+        lines.append(f"        result[{attribute!r}] = {value}")
+    lines.append("    return result")
+
+    env["_keys"] = frozenset(keys)
+    # Campos desconocidos o datos que no son un objeto: el error lo arma marshmallow
+    lines.insert(1, "    if data.__class__ is not dict or not data.keys() <= _keys:")
+    lines.insert(2, "        raise _Fallback()")
+    source = "\n".join(lines)
+    exec(compile(source, f"<loader {type(schema).__name__}>", "exec"), env)
+    load = env["load"]
+    load.source = source
+    return load
+
+
+class Loader:
+    """Carga de un esquema con partial fijo: load(data) como Schema.load"""
+
+    def __init__(self, schema_class, partial=None):
+        self.schema = schema_class()
+        self.partial = partial
+        self.fast = None
+        if not _has_load_hooks(self.schema) and self.schema.unknown == RAISE:
+            self.fast = compile_load(self.schema, partial)
+
+    def _fast(self, data):
+        # Para los esquemas anidados: sin camino rapido se delega todo
+        if self.fast is None:
+            raise _Fallback()
+        return self.fast(data)
+
+    def load(self, data):
+        if self.fast is not None:
+            try:
+                return self.fast(data)
+            except (_Fallback, ValidationError):
+                pass
+        return self.schema.load(data, partial=self.partial)
+
+
+_loaders = {}
+
+
+def loader(schema_class, partial=None):
+    """Loader (compilado una sola vez) del esquema con ese partial"""
+    key = (schema_class, partial)
+    result = _loaders.get(key)
+    if result is None:
+        result = _loaders[key] = Loader(schema_class, partial)
+    return result
+
+
+# Cargas que se compilan al arrancar: las de las escrituras de ordenes en app/views.py
+PRELOADED = (
+    (OrderSchema, ("user_id",)),
+    (OrderSchema, True),
+    (OrderItemSchema, None),
+    (OrderItemSchema, True),
+)
+
+
+def init_app(app):
+    for schema_class in PRECOMPILED:
+        compiled(schema_class)
+    for schema_class, partial in PRELOADED:
+        loader(schema_class, partial)
@@ -0,0 +1,207 @@
+# Cupo de porciones por item del menu (MenuItem.capacity).
+#
+# Lo que queda de cada item se reparte en varias filas de menu_item_stock
+# (shards). Tomar porciones es un UPDATE condicional sobre un shard elegido al
+# azar (remaining >= cantidad), asi que las ordenes de un plato muy pedido
+# bloquean filas distintas en vez de hacer fila sobre una sola. Solo cuando
+# ningun shard alcanza por si mismo se bloquean todos y se toma de varios.
+# Devolver porciones (bajas de items, ordenes canceladas o eliminadas) es un
+# UPDATE que suma en un shard cualquiera.
+#
+# Un item con capacity NULL no tiene limite ni filas de stock.
+
+import random
+
+from flask import current_app, jsonify
+from sqlalchemy import select, update, delete, insert, func
+
+from . import db
+from .models import MenuItem, MenuItemStock, Order, OrderItem
+
+
+class OutOfStock(Exception):
+    """No quedan porciones suficientes; se responde 409"""
+
+    def __init__(self, product_ids, msg="No quedan porciones suficientes", **extra):
+        super().__init__(msg)
+        self.msg = msg
+        self.product_ids = product_ids
+        self.extra = extra
+
+    def response(self):
+        return jsonify({"msg": self.msg, "product_ids": self.product_ids, **self.extra}), 409
+
+
+def shard_count():
+    return max(1, current_app.config.get("STOCK_SHARDS", 8))
+
+
+def split(remaining, shards):
+    base, extra = divmod(remaining, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def take(menu_item_id, quantity, product_id=None):
+    """Descuenta quantity porciones del item; OutOfStock si no alcanzan"""
+    if quantity <= 0:
+        # Una cantidad negativa sumaria porciones en vez de descontarlas
+        raise ValueError(f"Cantidad invalida para descontar: {quantity}")
+    shards = list(range(shard_count()))
+    random.shuffle(shards)
+    for shard in shards:
+        result = db.session.execute(
+            update(MenuItemStock)
+            .where(
+                MenuItemStock.menu_item_id == menu_item_id,
+                MenuItemStock.shard == shard,
+                MenuItemStock.remaining >= quantity
+            )
+            .values(remaining=MenuItemStock.remaining - quantity),
+            execution_options={"synchronize_session": False}
+        )
+        if result.rowcount:
+            return
+
+    # Ningun shard alcanza solo: se bloquean todos (en orden) y se toma de varios
+    rows = db.session.execute(
+        select(MenuItemStock.shard, MenuItemStock.remaining)
+        .where(MenuItemStock.menu_item_id == menu_item_id)
+        .order_by(MenuItemStock.shard)
+        .with_for_update()
+    ).all()
+    available = sum(remaining for _, remaining in rows)
+    if available < quantity:
+        raise OutOfStock([product_id] if product_id is not None else [], available=available)
+
+    pending = quantity
+    for shard, remaining in rows:
+        used = min(remaining, pending)
+        if used:
+            db.session.execute(
+                update(MenuItemStock)
+                .where(MenuItemStock.menu_item_id == menu_item_id, MenuItemStock.shard == shard)
+                .values(remaining=MenuItemStock.remaining - used),
+                execution_options={"synchronize_session": False}
+            )
+            pending -= used
+        if not pending:
+            break
+
+
+def release(menu_item_id, quantity, shard=None):
+    """Devuelve quantity porciones al item (no hace nada si no tiene cupo)"""
+    if quantity <= 0:
+        return
+    result = db.session.execute(
+        update(MenuItemStock)
+        .where(
+            MenuItemStock.menu_item_id == menu_item_id,
+            MenuItemStock.shard == (random.randrange(shard_count()) if shard is None else shard)
+        )
+        .values(remaining=MenuItemStock.remaining + quantity),
+        execution_options={"synchronize_session": False}
+    )
+    # El shard elegido puede no existir si se cambio STOCK_SHARDS; el 0 siempre esta
+    if not result.rowcount and shard != 0:
+        release(menu_item_id, quantity, shard=0)
+
+
+def capped_items(menu_day_id, product_ids):
+    """{product_id: menu_item_id} de los items con cupo del menu del dia"""
+    return dict(db.session.execute(
+        select(MenuItem.products_id, MenuItem.id).where(
+            MenuItem.menu_day_id == menu_day_id,
+            MenuItem.products_id.in_(product_ids),
+            MenuItem.capacity.is_not(None)
+        )
+    ).all())
+
+
+def take_products(menu_day_id, quantities):
+    """Descuenta las porciones de {product_id: cantidad} en el menu del dia"""
+    capped = capped_items(menu_day_id, quantities.keys())
+    # Siempre en el mismo orden, para que dos ordenes no se bloqueen cruzadas
+    for product_id, menu_item_id in sorted(capped.items(), key=lambda pair: pair[1]):
+        take(menu_item_id, quantities[product_id], product_id)
+
+
+def release_product(menu_day_id, product_id, quantity):
+    menu_item_id = capped_items(menu_day_id, [product_id]).get(product_id)
+    if menu_item_id is not None:
+        release(menu_item_id, quantity)
+
+
+def order_quantities(order_ids):
+    """[(menu_item_id, product_id, cantidad)] de los items con cupo de las ordenes"""
+    return db.session.execute(
+        select(MenuItem.id, MenuItem.products_id, func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(MenuItem, (MenuItem.menu_day_id == Order.menu_day_id) & (MenuItem.products_id == OrderItem.product_id))
+        .where(Order.id.in_(order_ids), MenuItem.capacity.is_not(None))
+        .group_by(MenuItem.id, MenuItem.products_id)
+        .order_by(MenuItem.id)
+    ).all()
+
+
+def release_orders(order_ids):
+    """Devuelve las porciones de las ordenes (al cancelarlas o eliminarlas)"""
+    if order_ids:
+        for menu_item_id, _, quantity in order_quantities(order_ids):
+            release(menu_item_id, int(quantity))
+
+
+def take_orders(order_ids):
+    """Vuelve a descontar las porciones de las ordenes (al sacarlas de CANCELADO)"""
+    if order_ids:
+        for menu_item_id, product_id, quantity in order_quantities(order_ids):
+            take(menu_item_id, int(quantity), product_id)
+
+
+def sold(menu_item):
+    """Porciones tomadas por ordenes no canceladas"""
+    return int(db.session.scalar(
+        select(func.coalesce(func.sum(OrderItem.quantity), 0))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(
+            Order.menu_day_id == menu_item.menu_day_id,
+            Order.status != "CANCELADO",
+            OrderItem.product_id == menu_item.products_id
+        )
+    ))
+
+
+def set_capacity(menu_item, capacity):
+    """Fija el cupo del item (None: sin limite) y reparte lo que queda en los shards.
+
+    Lo ya vendido se descuenta del nuevo cupo; OutOfStock si el cupo queda por
+    debajo de lo vendido. No hace commit.
+    """
+    # Se bloquean los shards actuales para que no se tomen porciones mientras tanto
+    db.session.execute(
+        select(MenuItemStock.shard).where(MenuItemStock.menu_item_id == menu_item.id).with_for_update()
+    ).all()
+    db.session.execute(delete(MenuItemStock).where(MenuItemStock.menu_item_id == menu_item.id))
+    menu_item.capacity = capacity
+    if capacity is None:
+        return None
+
+    taken = sold(menu_item)
+    if capacity < taken:
+        raise OutOfStock([menu_item.products_id], "El cupo no puede ser menor a lo ya vendido", sold=taken)
+    remaining = capacity - taken
+    db.session.execute(insert(MenuItemStock), [
+        {"menu_item_id": menu_item.id, "shard": shard, "remaining": value}
+        for shard, value in enumerate(split(remaining, shard_count()))
+    ])
+    return remaining
+
+
+def remaining_by_item(menu_item_ids):
+    """{menu_item_id: porciones que quedan} de los items con cupo"""
+    if not menu_item_ids:
+        return {}
+    return {item_id: int(total) for item_id, total in db.session.execute(
+        select(MenuItemStock.menu_item_id, func.sum(MenuItemStock.remaining))
+        .where(MenuItemStock.menu_item_id.in_(menu_item_ids))
+        .group_by(MenuItemStock.menu_item_id)
+    )}
@@ -0,0 +1,240 @@
+# Aceptacion asincronica de ordenes (POST /orders con "Prefer: respond-async").
+#
+# Cuando la base esta saturada el cliente no espera a que se cree la orden: el
+# pedido se valida contra una copia en cache del menu del dia, se guarda en la
+# tabla order_submissions (una sola fila, sin tocar orders ni el cupo) y se
+# responde 202 con un token. Un pool de workers toma las pendientes en lotes
+# (FOR UPDATE SKIP LOCKED, asi varios procesos no se pisan), vuelve a validar
+# contra la base y crea cada orden en su SAVEPOINT, con un commit por lote. El
+# cliente consulta el resultado en GET /orders/submissions/<token>.
+#
+# Si un worker se cae a mitad de lote, la transaccion se deshace y las filas
+# siguen pendientes para el proximo. Un error inesperado al crear una orden
+# deshace solo su SAVEPOINT: el pedido queda pendiente y se reintenta, y tras
+# ORDER_ASYNC_MAX_ATTEMPTS errores queda FALLIDA, sin frenar al resto del lote.
+
+import json
+import threading
+import uuid
+from datetime import datetime
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import select, event
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .groupcommit import copy_info
+from .lru import LRUCache
+from .models import Product, MenuDay, MenuItem, OrderSubmission
+from .orders import OrderError, prepare_items, create_order
+
+# Menu del dia por id: (abierto, {product_id: activo}); ver menu_snapshot
+menu_cache = LRUCache(maxsize=64, ttl=30, name="menus")
+
+
+def menu_snapshot(menu_day_id):
+    """Copia en cache de lo necesario para validar un pedido, o None si el dia no existe"""
+    snapshot = menu_cache.get(menu_day_id)
+    if snapshot is not None:
+        return snapshot
+
+    generation = menu_cache.generation
+    menu_day = db.session.get(MenuDay, menu_day_id)
+    if menu_day is None:
+        return None
+    products = dict(db.session.execute(
+        select(MenuItem.products_id, Product.active)
+        .join(Product, Product.id == MenuItem.products_id)
+        .where(MenuItem.menu_day_id == menu_day_id)
+    ).all())
+    snapshot = (bool(menu_day.is_open), products)
+    menu_cache.set(menu_day_id, snapshot, generation=generation)
+    return snapshot
+
+
+def validate_cached(menu_day_id, items):
+    """Mismos chequeos que prepare_items pero contra la cache; OrderError si no pasa.
+
+    La cache puede estar atrasada unos segundos: el worker vuelve a validar
+    contra la base antes de crear la orden.
+    """
+    snapshot = menu_snapshot(menu_day_id)
+    if snapshot is None or not snapshot[0]:
+        raise OrderError("Menu del dia no disponible", 400)
+    products = snapshot[1]
+
+    product_ids = {item["product_id"] for item in items}
+    not_in_menu = sorted(product_ids - products.keys())
+    if not_in_menu:
+        raise OrderError("Este producto no está en el menú del día de la orden", 400, product_ids=not_in_menu)
+    inactive = sorted(pid for pid in product_ids if not products[pid])
+    if inactive:
+        raise OrderError("Producto no disponible", 400, product_ids=inactive)
+
+
+def submit(user_id, menu_day_id, items):
+    """Valida contra la cache y encola el pedido; devuelve la fila (hace commit)"""
+    validate_cached(menu_day_id, items)
+    submission = OrderSubmission(
+        token=str(uuid.uuid4()),
+        user_id=user_id,
+        menu_day_id=menu_day_id,
+        payload=json.dumps([{"product_id": i["product_id"], "quantity": i["quantity"]} for i in items]),
+        status="PENDIENTE"
+    )
+    db.session.add(submission)
+    db.session.commit()
+    workers.wake()
+    return submission
+
+
+def materialize(submission, max_attempts=3):
+    """Crea la orden de un pedido pendiente.
+
+    Un OrderError lo deja rechazado; otro error (salvo los de la base, que
+    deshacen el lote) lo deja pendiente para reintentar, o FALLIDA si ya van
+    max_attempts.
+    """
+    saved = copy_info(db.session.info)
+    savepoint = db.session.begin_nested()
+    try:
+        rows = prepare_items(submission.menu_day_id, json.loads(submission.payload))
+        menu_day = db.session.get(MenuDay, submission.menu_day_id)
+        if menu_day is None or not menu_day.is_open:
+            raise OrderError("Menu del dia no disponible", 400)
+        order = create_order(submission.user_id, submission.menu_day_id, rows)
+    except OperationalError:
+        # Bloqueo, deadlock o conexion caida: no es culpa del pedido. Se deshace
+        # el lote entero y se reintenta sin contarlo
+        raise
+    except Exception as err:
+        savepoint.rollback()
+        # Los eventos juntados en el flush de la orden deshecha no se publican
+        db.session.info.clear()
+        db.session.info.update(saved)
+        if isinstance(err, OrderError):
+            submission.status = "RECHAZADA"
+            submission.error = json.dumps({"msg": err.msg, "status": err.status, **err.extra})
+        else:
+            current_app.logger.exception("Error creando la orden del pedido %s", submission.token)
+            submission.attempts += 1
+            if submission.attempts < max_attempts:
+                return
+            submission.status = "FALLIDA"
+            submission.error = json.dumps({"msg": "No se pudo crear la orden, intenta nuevamente", "status": 500})
+    else:
+        savepoint.commit()
+        submission.status = "CREADA"
+        submission.order_id = order.id
+    submission.processed_at = datetime.now()
+
+
+def process_batch(limit):
+    """Crea las ordenes de hasta limit pedidos pendientes en una transaccion; devuelve cuantos"""
+    pending = db.session.scalars(
+        select(OrderSubmission)
+        .where(OrderSubmission.status == "PENDIENTE")
+        .order_by(OrderSubmission.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    max_attempts = current_app.config.get("ORDER_ASYNC_MAX_ATTEMPTS", 3)
+    for submission in pending:
+        materialize(submission, max_attempts)
+    db.session.commit()
+    return len(pending)
+
+
+class SubmissionWorkers:
+    """Hilos que procesan la cola dentro del proceso web (ORDER_ASYNC_WORKERS)"""
+
+    def __init__(self):
+        self.app = None
+        self.count = 0
+        self.batch_size = 50
+        self.poll = 1.0
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.count = app.config.get("ORDER_ASYNC_WORKERS", 2)
+        self.batch_size = app.config.get("ORDER_ASYNC_BATCH", 50)
+        self.poll = app.config.get("ORDER_ASYNC_POLL_SECONDS", 1.0)
+        # Se arranca ya: los pendientes de antes de un reinicio no esperan a que
+        # llegue un pedido nuevo a este proceso
+        if app.config.get("ORDER_ASYNC_ENABLED", True) and self.count:
+            self._start()
+
+    def wake(self):
+        if self.count and len(self._threads) < self.count:
+            self._start()
+        self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.count:
+                thread = threading.Thread(target=self._run, name=f"order-submissions-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    # Se sigue mientras haya lotes completos
+                    while process_batch(self.batch_size) == self.batch_size:
+                        pass
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Error procesando pedidos pendientes")
+                finally:
+                    db.session.remove()
+
+
+workers = SubmissionWorkers()
+
+
+def submission_status(submission):
+    result = {
+        "token": submission.token,
+        "status": submission.status,
+        "menu_day_id": submission.menu_day_id,
+        "order_id": submission.order_id,
+        "created_at": submission.created_at.isoformat() if submission.created_at else None,
+        "processed_at": submission.processed_at.isoformat() if submission.processed_at else None,
+    }
+    if submission.error:
+        result["error"] = json.loads(submission.error)
+    return result
+
+
+# La cache del menu se vacia al hacer commit de cambios en menus, items o productos
+
+WATCHED = (MenuDay, MenuItem, Product)
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_menu_changes(session, flush_context):
+    if any(isinstance(obj, WATCHED) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["menus_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_menus(session):
+    if session.info.pop("menus_changed", False):
+        menu_cache.clear()
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_menu_changes(session):
+    session.info.pop("menus_changed", None)
+
+
+def init_app(app):
+    menu_cache.configure(app.config.get("MENU_CACHE_SIZE", 64), app.config.get("MENU_CACHE_TTL", 30))
+    workers.init_app(app)
@@ -0,0 +1,85 @@
+# Emision y rotacion de tokens.
+#
+# El access token dura poco (JWT_ACCESS_TOKEN_EXPIRES) y se renueva con el refresh
+# token en /auth/refresh, sin volver a verificar la contraseña. Cada refresh token
+# se puede usar una sola vez: al rotarlo se marca como usado y se emite otro de la
+# misma familia. Si aparece de nuevo uno ya usado, alguien lo copio, y se revoca
+# la familia completa (el dueño legitimo tendra que volver a loguearse).
+
+import uuid
+from datetime import datetime
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import delete
+
+from . import db
+from .models import User, RefreshToken
+
+
+class RefreshError(Exception):
+    """El refresh token no se puede usar; msg va en la respuesta 401"""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+        self.msg = msg
+
+
+def issue_tokens(user, family=None):
+    """Crea access y refresh token para user y registra el refresh (hace falta commit)"""
+    family = family or str(uuid.uuid4())
+    jti = str(uuid.uuid4())
+
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims={"role": user.role, "family": family}
+    )
+    refresh_token = create_refresh_token(
+        identity=str(user.id),
+        additional_claims={"jti": jti, "family": family}
+    )
+
+    db.session.add(RefreshToken(
+        jti=jti,
+        family=family,
+        user_id=user.id,
+        expires_at=datetime.now() + current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+    ))
+    return {"access_token": access_token, "refresh_token": refresh_token}
+
+
+def rotate(jwt_data):
+    """Cambia un refresh token valido por un par nuevo de la misma familia"""
+    token = RefreshToken.query.filter_by(jti=jwt_data["jti"]).with_for_update().first()
+    if not token or token.revoked:
+        raise RefreshError("Refresh token invalido")
+
+    if token.used_at is not None:
+        revoke_family(token.family)
+        db.session.commit()
+        raise RefreshError("Refresh token reutilizado, inicia sesion nuevamente")
+
+    # El rol se vuelve a leer de la base: un cambio de rol se refleja en el proximo refresh
+    user = db.session.get(User, token.user_id)
+    if not user:
+        raise RefreshError("Usuario no encontrado")
+
+    token.used_at = datetime.now()
+    tokens = issue_tokens(user, family=token.family)
+    db.session.commit()
+    return tokens
+
+
+def revoke_family(family):
+    RefreshToken.query.filter_by(family=family).update({"revoked": True}, synchronize_session=False)
+
+
+def purge_expired():
+    """Borra los refresh tokens vencidos (usados, revocados o no); devuelve cuantos.
+
+    Antes de vencer se conservan aunque esten usados: hacen falta para detectar
+    la reutilizacion.
+    """
+    result = db.session.execute(delete(RefreshToken).where(RefreshToken.expires_at < datetime.now()))
+    db.session.commit()
+    return result.rowcount
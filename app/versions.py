@@ -0,0 +1,182 @@
+# Versiones por tabla para los GET condicionales (ETag / Last-Modified / 304).
+#
+# Cada flush que inserta, modifica o borra productos, menus del dia o items del
+# menu incrementa la fila de esa tabla en table_versions, dentro de la misma
+# transaccion (si se hace rollback, la version tampoco cambia). Las versiones
+# se leen todas juntas en una consulta y se guardan por proceso unos instantes
+# (TABLE_VERSIONS_TTL); un commit local las descarta enseguida.
+#
+# El ETag de un GET es un hash de las versiones de las tablas que usa mas la
+# ruta con sus parametros, asi que se puede comparar con If-None-Match antes de
+# consultar o serializar nada. Last-Modified es el updated_at mas reciente (salvo
+# en las vistas con datos que no se siguen por tabla, ver conditional).
+#
+# Los cambios de otros procesos se ven cuando vence la copia local.
+
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import chain
+
+from flask import request, make_response, g
+from sqlalchemy import select, update, insert, event
+
+from . import db
+from .lru import LRUCache
+from .models import Product, MenuDay, MenuItem, TableVersion
+
+# Tablas seguidas: modelo -> nombre en table_versions
+TRACKED = {Product: "products", MenuDay: "menu_days", MenuItem: "menu_items"}
+
+# Una sola entrada: {nombre: (version, updated_at)}
+version_cache = LRUCache(maxsize=1, ttl=1, name="table_versions")
+
+GZIP_SUFFIX = "-gzip"
+
+
+def current_versions():
+    versions = version_cache.get("all")
+    if versions is None:
+        generation = version_cache.generation
+        versions = {name: (version, updated_at) for name, version, updated_at in db.session.execute(
+            select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        )}
+        version_cache.set("all", versions, generation=generation)
+    return versions
+
+
+def validators(tables):
+    """(etag, last_modified) de la ruta actual segun las versiones de tables"""
+    versions = current_versions()
+    digest = hashlib.sha1(request.full_path.encode())
+    modified = None
+    for name in tables:
+        version, updated_at = versions.get(name, (0, None))
+        digest.update(f"\0{name}:{version}".encode())
+        if updated_at is not None and (modified is None or updated_at > modified):
+            modified = updated_at
+    if modified is not None:
+        # updated_at se guarda en hora local (datetime.now), como el resto de las fechas
+        modified = modified.astimezone(timezone.utc)
+    return digest.hexdigest()[:20], modified
+
+
+def is_fresh(tag, modified, suffix=False):
+    """Si la copia del cliente sigue valida devuelve el ETag que coincidio, si no None.
+
+    Con suffix=True alcanza con que el ETag del cliente termine en ".<tag>"
+    (ETag compuestos, ver ProductDetailView).
+    """
+    if request.if_none_match:
+        if suffix:
+            for candidate in request.if_none_match.as_set(include_weak=True):
+                if candidate.endswith("." + tag):
+                    return candidate
+            return None
+        for candidate in (tag, tag + GZIP_SUFFIX):
+            if request.if_none_match.contains_weak(candidate):
+                return candidate
+        return None
+    # If-Modified-Since solo cuenta si no vino If-None-Match. Con ETag compuestos
+    # lo decide finish() despues de consultar, para responder el ETag completo
+    since = request.if_modified_since
+    if since is not None and not suffix and modified is not None and modified.replace(microsecond=0) <= since:
+        return tag
+    return None
+
+
+def not_modified(tag, modified):
+    response = make_response("", 304)
+    response.set_etag(tag)
+    if modified is not None:
+        response.last_modified = modified
+    return response
+
+
+def finish(response, tag, modified):
+    """Agrega ETag y Last-Modified a una respuesta 200 y la convierte en 304 si corresponde"""
+    if response.status_code != 200:
+        return response
+    if "ETag" not in response.headers:
+        if response.headers.get("Content-Encoding") == "gzip":
+            tag += GZIP_SUFFIX # Otra representacion: otro ETag fuerte
+        response.set_etag(tag)
+    if modified is not None:
+        response.last_modified = modified
+    return response.make_conditional(request)
+
+
+def conditional(*tables, last_modified=True):
+    """Decorador para GET: 304 antes de ejecutar la vista si no cambio ninguna de tables.
+
+    Si la vista pone g.etag_from_content (la respuesta depende de datos que no
+    se siguen por tabla), el ETag es un hash del cuerpo y el 304 se decide
+    despues de armarlo. Esas vistas van con last_modified=False: la fecha de
+    las tablas no dice nada de esos datos, asi que no se manda Last-Modified ni
+    se responde 304 solo por If-Modified-Since.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            tag, modified = validators(tables)
+            if not last_modified:
+                modified = None
+            matched = is_fresh(tag, modified)
+            if matched:
+                return not_modified(matched, modified)
+
+            response = make_response(fn(*args, **kwargs))
+            if g.pop("etag_from_content", False) and response.status_code == 200:
+                response.add_etag(overwrite=True)
+                tag = response.get_etag()[0]
+                modified = None
+            return finish(response, tag, modified)
+        return wrapper
+    return decorator
+
+
+# Incremento de versiones en el flush
+
+def touch(session, *names):
+    """Para cambios hechos con UPDATE/DELETE masivos, que no pasan por el flush"""
+    session.info.setdefault("tables_changed", set()).update(names)
+    _bump(session, names)
+
+
+def _bump(session, names):
+    connection = session.connection()
+    now = datetime.now()
+    for name in sorted(names): # Siempre en el mismo orden, para no bloquearse cruzados
+        result = connection.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.name == name)
+            .values(version=TableVersion.__table__.c.version + 1, updated_at=now)
+        )
+        if not result.rowcount:
+            # Base creada sin la migracion que carga las filas
+            connection.execute(insert(TableVersion.__table__).values(name=name, version=1, updated_at=now))
+
+
+@event.listens_for(db.session, "after_flush")
+def bump_versions(session, flush_context):
+    # Los objetos "dirty" sin cambios reales (ej: se asigno el mismo valor) no cuentan
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+    names = {TRACKED[type(obj)] for obj in chain(session.new, dirty, session.deleted) if type(obj) in TRACKED}
+    if names:
+        session.info.setdefault("tables_changed", set()).update(names)
+        _bump(session, names)
+
+
+@event.listens_for(db.session, "after_commit")
+def refresh_versions(session):
+    if session.info.pop("tables_changed", None):
+        version_cache.clear()
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_versions(session):
+    session.info.pop("tables_changed", None)
+
+
+def init_app(app):
+    version_cache.configure(1, app.config.get("TABLE_VERSIONS_TTL", 1))
@@ -1,22 +1,49 @@
 # Aca crearemos las vistas
 
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response, url_for, make_response, g
 from flask.views import MethodView
 from marshmallow import ValidationError
-from functools import wraps
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from functools import wraps, partial
+from math import ceil
 
 
 from flask_jwt_extended import(
-    create_access_token,
     jwt_required,
-    get_jwt_identity,
     verify_jwt_in_request,
-    get_jwt
+    get_jwt,
+    current_user
 )
 
-from . import db
-from .models import User, Product, MenuDay, MenuItem, Order, OrderItem
-from .schemas import UserSchema, ProductSchema, MenuDaySchema, MenuItemSchema, OrderSchema, OrderItemSchema
+from . import db, hasher
+from .passwords import HasherBusy
+from .lru import caches
+from .ratelimit import login_limiter
+from .revocation import revocations
+from .tokens import issue_tokens, rotate, revoke_family, RefreshError
+from .models import User, Product, MenuDay, MenuItem, Order, OrderItem, OrderSubmission, ORDER_STATUSES
+from .production import production_sheet
+from .events import stream, broker
+from .idempotency import idempotent
+from .stock import (
+    OutOfStock, set_capacity, release_product, take_products,
+    release_orders, take_orders, remaining_by_item
+)
+from .orders import OrderError, prepare_items, place_order, add_item, adjust_total, bulk_transition
+from .groupcommit import run_write, GroupCommitTimeout
+from .serializers import compiled, loader
+from .catalog import catalog_cache, cached_page, store_page, page_response, table_version
+from .versions import conditional, validators, is_fresh, not_modified, finish
+from .submissions import submit, submission_status
+from .pagination import (
+    paginate, page_headers, PaginationError,
+    equals, one_of, boolean, since, until, created_range
+)
+from .schemas import (
+    UserSchema, ProductSchema, MenuDaySchema, MenuItemSchema, OrderSchema, OrderItemSchema,
+    MenuDayWithItemsSchema, MenuDayWithProductsSchema, OrderStatusBulkSchema
+)
 
 # Decorador para verificar el rol del usuario
 def role_required(*allowed_roles: str):
@@ -32,6 +59,50 @@ def role_required(*allowed_roles: str):
         return wrapper
     return decorator
 
+# Respuesta rapida cuando el pool de hashing esta saturado
+def hasher_busy_response():
+    return jsonify({"msg": "Servidor ocupado, intenta nuevamente en unos segundos"}), 503, {
+        "Retry-After": str(hasher.retry_after)
+    }
+
+# El cliente pide aceptacion asincronica (RFC 7240) y el modo esta habilitado
+def wants_async():
+    if not current_app.config.get("ORDER_ASYNC_ENABLED", True):
+        return False
+    prefer = request.headers.get("Prefer", "")
+    return "respond-async" in [part.strip().lower() for part in prefer.split(",")]
+
+# La escritura quedo en la cola de group commit mas tiempo del permitido
+def group_commit_timeout_response():
+    return jsonify({"msg": "Servidor ocupado, intenta nuevamente en unos segundos"}), 503, {"Retry-After": "1"}
+
+# Control de concurrencia optimista: la version de la fila viaja como ETag y vuelve en If-Match
+def etag(obj):
+    return {"ETag": f'"{obj.version}"'}
+
+def product_etag(product):
+    """ETag "<version>.<tabla>" como el de ProductDetailView.get (despues del commit)"""
+    tables_tag, _ = validators(("products",))
+    return {"ETag": f'"{product.version}.{tables_tag}"'}
+
+def requested_version():
+    """Version pedida en If-Match; None si no se mando (o se mando *), -1 si no es valida"""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    for tag in request.if_match.as_set():
+        # Tambien acepta los ETag "<version>.<catalogo>" de ProductDetailView.get
+        tag = tag.split(".", 1)[0]
+        if tag.isdigit():
+            return int(tag)
+    return -1
+
+def version_conflict_response(current_version=None):
+    db.session.rollback()
+    body = {"msg": "El recurso fue modificado por otro usuario, volver a cargarlo"}
+    if current_version is not None:
+        body["version"] = current_version
+    return jsonify(body), 409
+
 class UserRegisterView(MethodView):
     def post(self):
         data = request.get_json() # Obtener datos del request
@@ -56,7 +127,10 @@ class UserRegisterView(MethodView):
             role = user_data.get('role', 'client')
         )
 
-        new_user.set_password(user_data.get('password')) # Hashear la contraseña
+        try:
+            new_user.set_password(user_data.get('password')) # Hashear la contraseña
+        except HasherBusy:
+            return hasher_busy_response()
 
         db.session.add(new_user)
         db.session.commit()
@@ -75,20 +149,52 @@ class UserLoginView(MethodView):
         if not username or not password:
             return jsonify({"msg": "Usuario y contraseña requeridos"}), 400
 
+        # Antes de tocar la base o el hasher
+        wait = login_limiter.hit(username, request.remote_addr)
+        if wait:
+            return jsonify({"msg": "Demasiados intentos, espera unos segundos"}), 429, {
+                "Retry-After": str(ceil(wait))
+            }
+
         user = User.query.filter_by(username=username).first()
-        if not user or not user.check_password(password):
-            return jsonify({"msg": "Credenciales invalidas"}), 401
+        try:
+            if not user or not user.check_password(password):
+                return jsonify({"msg": "Credenciales invalidas"}), 401
+        except HasherBusy:
+            return hasher_busy_response()
+
+        user.rehash_password_later(password) # Actualiza el costo del hash sin demorar la respuesta
         
-        additional_claims = {"role": user.role}
-        access_token = create_access_token(identity=user.id, additional_claims=additional_claims)
+        # Access token corto + refresh token para renovarlo sin volver a hashear
+        tokens = issue_tokens(user)
+        db.session.commit()
 
-        return jsonify(access_token=access_token), 200
+        return jsonify(tokens), 200
+
+class TokenRefreshView(MethodView):
+    @jwt_required(refresh=True)
+    def post(self):
+        try:
+            tokens = rotate(get_jwt())
+        except RefreshError as err:
+            return jsonify({"msg": err.msg}), 401
+        return jsonify(tokens), 200
+    
+class UserLogoutView(MethodView):
+    @jwt_required()
+    def post(self):
+        # Revoca el token actual hasta su vencimiento y los refresh tokens de la sesion
+        claims = get_jwt()
+        revocations.revoke(claims)
+        if claims.get("family"):
+            revoke_family(claims["family"])
+        db.session.commit()
+        return jsonify({"msg": "Sesion cerrada"}), 200
     
 class MeView(MethodView):
     @jwt_required()
     def get(self):
-        uid = int(get_jwt_identity())
-        u = User.query.get(uid)
+        u = current_user.user # Cargado una sola vez por request (y cacheado por proceso)
         if not u:
             return jsonify({"msg": "Usuario no encontrado"}), 404
         
@@ -96,15 +202,57 @@ class MeView(MethodView):
         result = user_schema.dump(u)
         return jsonify(result), 200
 
+# Contadores de las caches de este proceso (para ver si se pagan)
+class CacheStatsView(MethodView):
+    @role_required("admin")
+    def get(self):
+        return jsonify({name: cache.stats() for name, cache in caches.items()}), 200
+
 # Vistas para menu y productos se implementaran luego
 
+# ?expand= permitidos en los menus del dia: schema de salida y carga con selectinload,
+# asi cada nivel se trae en una sola consulta sin importar cuantos items haya
+MENU_DAY_EXPANSIONS = {
+    frozenset(): (MenuDaySchema, ()),
+    frozenset({"items"}): (MenuDayWithItemsSchema, (selectinload(MenuDay.items),)),
+    frozenset({"items", "items.product"}): (
+        MenuDayWithProductsSchema,
+        (selectinload(MenuDay.items).selectinload(MenuItem.product),)
+    ),
+}
+
+# Tablas de las que dependen los GET de menus del dia (con cualquier ?expand=)
+MENU_DAY_TABLES = ("menu_days", "menu_items", "products")
+
+def menu_day_expansion():
+    """Devuelve (schema, opciones de carga) segun ?expand=, o None si no es valido"""
+    expand = {part.strip() for part in request.args.get("expand", "").split(",") if part.strip()}
+    if "items.product" in expand:
+        expand.add("items")
+    return MENU_DAY_EXPANSIONS.get(frozenset(expand))
+
 class MenuDayListView(MethodView):
+    @conditional(*MENU_DAY_TABLES)
     def get(self):
-        # Listar todos los menus del dia
-        menu_days = MenuDay.query.all()
-        menu_day_schema = MenuDaySchema(many=True)
-        result = menu_day_schema.dump(menu_days) # Serializar resultados
-        return jsonify(result), 200
+        # Listar los menus del dia (paginado)
+        filters = {
+            "is_open": boolean(MenuDay.is_open),
+            "date_from": since(MenuDay.date),
+            "date_to": until(MenuDay.date),
+            **created_range(MenuDay)
+        }
+        expansion = menu_day_expansion()
+        if not expansion:
+            return jsonify({"msg": "expand invalido (opciones: items, items.product)"}), 400
+        schema_class, options = expansion
+
+        try:
+            menu_days, next_cursor = paginate(MenuDay.query.options(*options), MenuDay, filters, params=("expand",))
+        except PaginationError as err:
+            return jsonify({"msg": err.msg}), 400
+
+        result = compiled(schema_class).dump_many(menu_days) # Serializar resultados
+        return jsonify(result), 200, page_headers(next_cursor)
     
     @role_required("admin")
     # Crear un nuevo menu del dia
@@ -133,14 +281,19 @@ class MenuDayListView(MethodView):
         return jsonify({"msg": "Menu del día creado exitosamente"}), 201
     
 class MenuDayDetailView(MethodView):
+    @conditional(*MENU_DAY_TABLES)
     def get(self, menu_day_id):
         # Obtener detalles del menu del dia
-        menu_day = MenuDay.query.get(menu_day_id)
+        expansion = menu_day_expansion()
+        if not expansion:
+            return jsonify({"msg": "expand invalido (opciones: items, items.product)"}), 400
+        schema_class, options = expansion
+
+        menu_day = MenuDay.query.options(*options).get(menu_day_id)
         if not menu_day:
             return jsonify({"msg": "Menu del día no encontrado"}), 404
         
-        menu_day_schema = MenuDaySchema() # Validar datos con Marshmallow
-        result = menu_day_schema.dump(menu_day) # Serializar resultados
+        result = compiled(schema_class).dump(menu_day) # Serializar resultados
         return jsonify(result), 200
     
     @role_required("admin")
@@ -174,17 +327,40 @@ class MenuDayDetailView(MethodView):
         db.session.delete(menu)
         db.session.commit()
         return jsonify({"msg": "Menu eliminado exitosamente"}), 200
+
+# Planilla de produccion: cantidades y montos por producto y estado para un menu del dia
+class MenuDayProductionView(MethodView):
+    @role_required("admin")
+    def get(self, menu_day_id):
+        menu_day = MenuDay.query.get(menu_day_id)
+        if not menu_day:
+            return jsonify({"msg": "Menu del día no encontrado"}), 404
+
+        sheet, cached = production_sheet(menu_day)
+        return jsonify(sheet), 200, {"X-Cache": "HIT" if cached else "MISS"}
     
 class MenuItemListView(MethodView):
+    @conditional("menu_days", "menu_items", last_modified=False) # remaining cambia sin tocar las tablas
     def get(self, menu_day_id): # Listar items de un menu del dia
         menu_day = MenuDay.query.get(menu_day_id)
         if not menu_day:
             return jsonify({"msg": "Menu del día no encontrado"}), 404
         
-        items = MenuItem.query.filter_by(menu_day_id=menu_day_id).all()
-        menu_item_schema = MenuItemSchema(many=True) # Validar datos con Marshmallow
-        result = menu_item_schema.dump(items) # Serializar resultados
-        return jsonify(result), 200
+        filters = {"products_id": equals(MenuItem.products_id), **created_range(MenuItem)}
+        try:
+            items, next_cursor = paginate(MenuItem.query.filter_by(menu_day_id=menu_day_id), MenuItem, filters)
+        except PaginationError as err:
+            return jsonify({"msg": err.msg}), 400
+
+        result = compiled(MenuItemSchema).dump_many(items) # Serializar resultados
+        # Porciones que quedan de los items con cupo, en una sola consulta por pagina
+        remaining = remaining_by_item([item.id for item in items if item.capacity is not None])
+        for item, data in zip(items, result):
+            if item.capacity is not None:
+                data["remaining"] = remaining.get(item.id, 0)
+        # Lo que queda cambia con cada orden, sin tocar menu_items: el ETag sale del contenido
+        g.etag_from_content = bool(remaining)
+        return jsonify(result), 200, page_headers(next_cursor)
     
     @role_required("admin")
     def post(self, menu_day_id): # Agregar item a un menu del dia
@@ -220,11 +396,47 @@ class MenuItemListView(MethodView):
         )
 
         db.session.add(new_item)
+        if menu_item_data.get('capacity') is not None:
+            db.session.flush() # Para obtener el id del item
+            try:
+                set_capacity(new_item, menu_item_data['capacity'])
+            except OutOfStock as err:
+                db.session.rollback()
+                return err.response()
         db.session.commit()
         return jsonify(menu_item_schema.dump(new_item)), 201
     
     
 class MenuItemDetailView(MethodView):
+    @role_required("admin")
+    def put(self, item_id):
+        """Cambiar el cupo de porciones del item (null: sin limite)"""
+        item = MenuItem.query.get(item_id)
+        if not item:
+            return jsonify({"msg": "Item no encontrado"}), 404
+
+        data = request.get_json()
+        if not data or "capacity" not in data:
+            return jsonify({"msg": "Datos inválidos"}), 400
+
+        menu_item_schema = MenuItemSchema(only=("capacity",))
+        try:
+            menu_item_data = menu_item_schema.load(data)
+        except ValidationError as err:
+            return jsonify(err.messages), 400
+
+        try:
+            remaining = set_capacity(item, menu_item_data["capacity"])
+        except OutOfStock as err:
+            db.session.rollback()
+            return err.response()
+        db.session.commit()
+
+        result = MenuItemSchema().dump(item)
+        if remaining is not None:
+            result["remaining"] = remaining
+        return jsonify(result), 200
+
     @role_required("admin")
     def delete(self, item_id):
         """Eliminar item específico del menú"""
@@ -239,12 +451,22 @@ class MenuItemDetailView(MethodView):
 # Vistas de los productos
 
 class ProductListView(MethodView):
+    @conditional("products")
     def get(self):
-        # Listar todos los productos
-        product = Product.query.all()
-        product_schema = ProductSchema(many=True)
-        result = product_schema.dump(product) # Serializar resultados
-        return jsonify(result), 200
+        # Listar los productos (paginado); cada pagina se sirve ya serializada de la cache
+        page = cached_page()
+        if page is not None:
+            return page_response(page, cached=True)
+
+        generation, products_version = catalog_cache.generation, table_version()
+        filters = {"active": boolean(Product.active), **created_range(Product)}
+        try:
+            product, next_cursor = paginate(Product.query, Product, filters)
+        except PaginationError as err:
+            return jsonify({"msg": err.msg}), 400
+
+        result = compiled(ProductSchema).dump_many(product) # Serializar resultados
+        return page_response(store_page(result, next_cursor, generation, products_version), cached=False)
     
     @role_required("admin")
     def post(self):
@@ -273,20 +495,31 @@ class ProductListView(MethodView):
     
 class ProductDetailView(MethodView):
     def get(self, product_id):
+        # ETag "<version del producto>.<version de la tabla>": la primera parte es la
+        # de If-Match; con la segunda se responde 304 sin consultar mientras no cambie
+        # ningun producto
+        tables_tag, modified = validators(("products",))
+        matched = is_fresh(tables_tag, modified, suffix=True)
+        if matched:
+            return not_modified(matched, modified)
+
         # Obtener detalles de un producto
         product = Product.query.get(product_id)
         if not product:
             return jsonify({"msg": "Producto no encontrado"}), 404
         
-        product_schema = ProductSchema()
-        result = product_schema.dump(product) # Serializar resultados
-        return jsonify(result), 200
+        result = compiled(ProductSchema).dump(product) # Serializar resultados
+        return finish(make_response(jsonify(result)), f"{product.version}.{tables_tag}", modified)
     
     @role_required("admin")
     def put(self, product_id):
         product = Product.query.get(product_id) # Obtener el producto a actualizar
         if not product:
             return jsonify({"msg": "Producto no encontrado"}), 404
+
+        expected = requested_version()
+        if expected is not None and expected != product.version:
+            return version_conflict_response(product.version)
         
         data = request.get_json() # Obtener los datos del request
         if not data:
@@ -305,8 +538,11 @@ class ProductDetailView(MethodView):
         product.active = product_data.get('active', product.active)
         product.image_url = product_data.get('image_url', product.image_url)
 
-        db.session.commit()
-        return jsonify(product_schema.dump(product)), 200
+        try:
+            db.session.commit() # UPDATE ... WHERE version = version leida
+        except StaleDataError:
+            return version_conflict_response()
+        return jsonify(product_schema.dump(product)), 200, product_etag(product)
     
     @role_required("admin")
     def delete(self, product_id):
@@ -314,9 +550,16 @@ class ProductDetailView(MethodView):
 
         if not product:
             return jsonify({"msg": "Producto no encontrado"}), 404
+
+        expected = requested_version()
+        if expected is not None and expected != product.version:
+            return version_conflict_response(product.version)
         
         db.session.delete(product)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            return version_conflict_response()
         return jsonify({"msg": "Producto eliminado exitosamente"}), 200
     
 # Vistas para ordenes se implementaran luego
@@ -325,74 +568,172 @@ class OrderListView(MethodView):
     # ✅ Correcto: clients ven sus ordenes, admins ven todas
     @jwt_required()
     def get(self):
-        uid = int(get_jwt_identity())
-        user = User.query.get(uid)
-        
-        if user.role == "admin":
-            orders = Order.query.all()
+        filters = {
+            "status": one_of(Order.status, ORDER_STATUSES),
+            "menu_day_id": equals(Order.menu_day_id),
+            **created_range(Order)
+        }
+        # El rol sale de los claims del token, sin consultar la tabla users
+        if current_user.is_admin:
+            query = Order.query
+            filters["user_id"] = equals(Order.user_id)
         else:
-            orders = Order.query.filter_by(user_id=uid).all()
+            query = Order.query.filter_by(user_id=current_user.id)
+
+        try:
+            orders, next_cursor = paginate(query, Order, filters)
+        except PaginationError as err:
+            return jsonify({"msg": err.msg}), 400
         
-        order_schema = OrderSchema(many=True)
-        result = order_schema.dump(orders)
-        return jsonify(result), 200
+        result = compiled(OrderSchema).dump_many(orders)
+        return jsonify(result), 200, page_headers(next_cursor)
     
     @jwt_required()
+    @idempotent # Los reintentos con el mismo Idempotency-Key reciben la respuesta original
     # Para crear una orden (solo clientes)
     def post(self):
-        uid = int(get_jwt_identity()) # Obtener el ID del usuario desde el token JWT
-        user = User.query.get(uid) # Obtenemos el usuario
+        uid = current_user.id # Obtener el ID del usuario desde el token JWT
 
-        if not user:
+        if not current_user.user: # El usuario pudo haber sido eliminado despues de emitir el token
             return jsonify({"msg": "Usuario no encontrado"}), 404
         
         data = request.get_json() # Obtener los datos del request
         if not data:
             return jsonify({"msg": "Datos inválidos"}), 400
         
-        order_schema = OrderSchema() # Validar datos con Marshmallow
         try:
-            order_data = order_schema.load(data, partial=True) # Validar datos con Marshmallow
+            # user_id sale del token; los items (opcionales) se validan completos
+            order_data = loader(OrderSchema, partial=("user_id",)).load(data) # Validar datos (marshmallow si hay errores)
         except ValidationError as err:
             return jsonify(err.messages), 400
         
+        # Modo asincronico: se valida contra el menu en cache, se encola y se responde 202
+        if wants_async():
+            try:
+                submission = submit(uid, order_data.get('menu_day_id'), order_data.get('items', []))
+            except OrderError as err:
+                return err.response()
+            return jsonify(submission_status(submission)), 202, {
+                "Location": url_for("order_submission", token=submission.token),
+                "Preference-Applied": "respond-async"
+            }
+
         # Verificar que el menu del dia exista y este abierto
         menu_day = MenuDay.query.get(order_data.get('menu_day_id'))
         if not menu_day or not menu_day.is_open:
             return jsonify({"msg": "Menu del dia no disponible"}), 400
-        
-        new_order = Order(
-            user_id = uid,
-            menu_day_id = order_data.get('menu_day_id'),
-            total_price = 0, # Se calculara luego
-            status = "CREADO"
-        )
 
-        db.session.add(new_order)
-        db.session.commit()
-        return jsonify(order_schema.dump(new_order)), 201
+        # Orden e items en una sola transaccion
+        try:
+            rows = prepare_items(menu_day.id, order_data.get('items', []))
+        except OrderError as err:
+            return err.response()
+
+        # Las escrituras van con su propio commit o en el lote de group commit
+        try:
+            result = run_write(partial(place_order, uid, menu_day.id, rows))
+        except OrderError as err:
+            return err.response()
+        except GroupCommitTimeout:
+            return group_commit_timeout_response()
+        return jsonify(result), 201
     
+# Estado de un pedido aceptado con 202
+class OrderSubmissionView(MethodView):
+    @jwt_required()
+    def get(self, token):
+        submission = OrderSubmission.query.filter_by(token=token).first()
+        if not submission or (submission.user_id != current_user.id and not current_user.is_admin):
+            return jsonify({"msg": "Pedido no encontrado"}), 404
+
+        headers = {}
+        if submission.order_id:
+            headers["Location"] = url_for("order_detail", order_id=submission.order_id)
+        elif submission.status == "PENDIENTE":
+            headers["Retry-After"] = "1"
+        return jsonify(submission_status(submission)), 200, headers
+
+# Cambio de estado de muchas ordenes en una transaccion (ej: LISTO -> ENTREGADO tras el reparto)
+class OrderStatusBulkView(MethodView):
+    @role_required("admin")
+    def post(self):
+        data = request.get_json()
+        if not data:
+            return jsonify({"msg": "Datos inválidos"}), 400
+
+        try:
+            bulk_data = OrderStatusBulkSchema().load(data)
+        except ValidationError as err:
+            return jsonify(err.messages), 400
+
+        try:
+            updated, missing, wrong_status = bulk_transition(
+                bulk_data["from_status"], bulk_data["to_status"],
+                menu_day_id=bulk_data.get("menu_day_id"),
+                order_ids=bulk_data.get("order_ids")
+            )
+        except OrderError as err:
+            return err.response()
+        db.session.commit()
+
+        return jsonify({
+            "from": bulk_data["from_status"],
+            "to": bulk_data["to_status"],
+            "updated": len(updated),
+            "updated_ids": updated,
+            "skipped": {
+                "not_found": missing,
+                # id -> estado actual, para las que no estaban en "from"
+                "status": {str(order_id): status for order_id, status in sorted(wrong_status.items())}
+            }
+        }), 200
+
+# Stream SSE de cambios de estado: reemplaza el polling de GET /orders y GET /orders/<id>.
+# EventSource no manda headers, asi que el token tambien se acepta en ?jwt=
+class OrderStreamView(MethodView):
+    @jwt_required(locations=["headers", "query_string"])
+    def get(self):
+        menu_day_id = request.args.get("menu_day_id")
+        if menu_day_id is not None:
+            if not menu_day_id.isdigit():
+                return jsonify({"msg": "menu_day_id invalido"}), 400
+            menu_day_id = int(menu_day_id)
+
+        # Cada stream ocupa un hilo del servidor mientras este abierto
+        if not broker.acquire_stream():
+            return jsonify({"msg": "Demasiados streams abiertos, intenta nuevamente en unos segundos"}), 503, {
+                "Retry-After": "5"
+            }
+
+        # Clientes: solo sus ordenes; admins (ej: pantalla de cocina): todas
+        events = stream(
+            current_app.config.get("ORDER_EVENTS_HEARTBEAT_SECONDS", 15),
+            user_id=None if current_user.is_admin else current_user.id,
+            menu_day_id=menu_day_id,
+            last_event_id=request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        )
+        response = Response(events, mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no" # Sin buffer en nginx
+        })
+        # Al cerrar la respuesta, aunque el generador no haya llegado a arrancar
+        response.call_on_close(broker.release_stream)
+        return response
+
 class OrderDetailView(MethodView):
     # Para obtener los detalles de una orden
     @jwt_required()
     def get(self, order_id):
-        uid = int(get_jwt_identity()) # Obtener el ID del usuario
-        user = User.query.get(uid) # Obtener el usuario
-
-        if not user:
-            return jsonify({"msg": "Usuario no encontrado"}), 404
-        
         order = Order.query.get(order_id) # Obtener la orden
         if not order:
             return jsonify({"msg": "Orden no encontrada"}), 404
         
         # Verificar que el usuario sea el dueño de la orden o un admin
-        if order.user_id != uid and user.role != "admin":
+        if order.user_id != current_user.id and not current_user.is_admin:
             return jsonify({"msg": "No tienes permiso para ver esta orden"}), 403
         
-        order_schema = OrderSchema() # Validar datos con Marshmallow
-        result = order_schema.dump(order) # Serializar resultados
-        return jsonify(result), 200 # Retornar la orden
+        result = compiled(OrderSchema).dump(order) # Serializar resultados
+        return jsonify(result), 200, etag(order) # Retornar la orden
     
     @role_required("admin")
     def put(self, order_id):
@@ -400,33 +741,59 @@ class OrderDetailView(MethodView):
         order = Order.query.get(order_id) # Obtener la orden
         if not order:
             return jsonify({"msg": "Orden no encontrada"}), 404
+
+        # Sin locks: si la orden cambio desde que el cliente la leyo, 409
+        expected = requested_version()
+        if expected is not None and expected != order.version:
+            return version_conflict_response(order.version)
         
         data = request.get_json() # Obtener los datos del request
         if not data:
             return jsonify({"msg": "Datos inválidos"}), 400
         
-        order_schema = OrderSchema()
         try:
-            order_data = order_schema.load(data, partial=True) # Validar datos con Marshmallow
+            order_data = loader(OrderSchema, partial=True).load(data) # Validar datos (marshmallow si hay errores)
         except ValidationError as err:
             return jsonify(err.messages), 400
         
         # Actualizar el estado de la orden
+        previous_status = order.status
         order.status = order_data.get('status', order.status)
-        valid_statuses = ["CREADO", "EN_PREPARACION", "LISTO", "ENTREGADO", "CANCELADO"]
-        if order.status not in valid_statuses:
+        if order.status not in ORDER_STATUSES:
             return jsonify({"msg": "Estado de orden no válido"}), 400
-        db.session.commit()
-        return jsonify(order_schema.dump(order)), 200 # Retornar la orden actualizada
+
+        # Las ordenes canceladas no ocupan cupo
+        try:
+            if order.status == "CANCELADO" and previous_status != "CANCELADO":
+                release_orders([order.id])
+            elif previous_status == "CANCELADO" and order.status != "CANCELADO":
+                take_orders([order.id])
+        except OutOfStock as err:
+            db.session.rollback()
+            return err.response()
+        try:
+            db.session.commit() # UPDATE ... WHERE version = version leida
+        except StaleDataError:
+            return version_conflict_response()
+        return jsonify(compiled(OrderSchema).dump(order)), 200, etag(order) # Retornar la orden actualizada
     
     @role_required("admin")
     def delete(self, order_id):
         order = Order.query.get(order_id) # Obtener la orden
         if not order:
             return jsonify({"msg": "Orden no encontrada"}), 404
-        
+
+        expected = requested_version()
+        if expected is not None and expected != order.version:
+            return version_conflict_response(order.version)
+
+        if order.status != "CANCELADO":
+            release_orders([order.id])
         db.session.delete(order)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            return version_conflict_response()
         return jsonify({"msg": "Orden eliminada exitosamente"}), 200
 
 # Vistas para items de orden se implementaran luego
@@ -435,49 +802,41 @@ class OrderItemListView(MethodView):
     @jwt_required()
     # Obtener los items de una orden (clientes solo pueden ver sus ordenes, admins pueden ver todas)
     def get(self, order_id):
-        uid = int(get_jwt_identity())
-        user = User.query.get(uid)
-
-        if not user:
-            return jsonify({"msg": "Usuario no encontrado"}), 404
-        
         order = Order.query.get(order_id)
 
         if not order:
             return jsonify({"msg": "Orden no encontrada"}), 404
         
-        if order.user_id != uid and user.role != "admin":
+        if order.user_id != current_user.id and not current_user.is_admin:
             return jsonify({"msg": "No tienes permiso para ver los items de esta orden"}), 403
         
-        items = OrderItem.query.filter_by(order_id=order_id).all()
-        order_item_schema = OrderItemSchema(many=True)
-        result = order_item_schema.dump(items)
-        return jsonify(result), 200
+        filters = {"product_id": equals(OrderItem.product_id), **created_range(OrderItem)}
+        try:
+            items, next_cursor = paginate(OrderItem.query.filter_by(order_id=order_id), OrderItem, filters)
+        except PaginationError as err:
+            return jsonify({"msg": err.msg}), 400
+
+        result = compiled(OrderItemSchema).dump_many(items)
+        return jsonify(result), 200, page_headers(next_cursor)
     
     @jwt_required()
+    @idempotent
     # Agregar item a una orden (solo clientes pueden agregar a sus ordenes, admins pueden agregar a cualquier orden)
     def post(self, order_id):
-        uid = int(get_jwt_identity())
-        user = User.query.get(uid)
-
-        if not user:
-            return jsonify({"msg": "Usuario no encontrado"}), 404
-        
         order = Order.query.get(order_id)
 
         if not order:
             return jsonify({"msg": "Orden no encontrada"}), 404
         
-        if order.user_id != uid and user.role != "admin":
+        if order.user_id != current_user.id and not current_user.is_admin:
             return jsonify({"msg": "No tienes permiso para agregar items a esta orden"}), 403
         
         data = request.get_json()
         if not data:
             return jsonify({"msg": "Datos invalidos"}), 400
         
-        order_item_schema = OrderItemSchema()
         try:
-            order_item_data = order_item_schema.load(data) # Validar datos con Marshmallow
+            order_item_data = loader(OrderItemSchema).load(data) # Validar datos (marshmallow si hay errores)
         except ValidationError as err:
             return jsonify(err.messages), 400
         
@@ -497,73 +856,71 @@ class OrderItemListView(MethodView):
             return jsonify({"msg": "Este producto no está en el menú del día de la orden"}), 400
         # Crear el nuevo item de orden
 
-        new_item = OrderItem(
-            order_id = order_id,
-            product_id = order_item_data.get('product_id'),
-            quantity = order_item_data.get('quantity'),
-            price = product.price * order_item_data.get('quantity') # Calcular el precio total del item
+        # Crear el item: descuenta las porciones si el item del menu tiene cupo y
+        # suma al total de la orden; If-Match lleva la version de la orden
+        job = partial(
+            add_item,
+            order.id,
+            product.id,
+            order_item_data.get('quantity'),
+            product.price * order_item_data.get('quantity'), # Calcular el precio total del item
+            menu_item_id=menu_item.id if menu_item.capacity is not None and order.status != "CANCELADO" else None,
+            expected_version=requested_version()
         )
-        
-        db.session.add(new_item)
-        db.session.flush()  # Guardar el item antes de recalcular
-        
-        # Recalcular y guardar el total de la orden
-        order.calculate_total_price()
-        db.session.commit()
-        return jsonify(order_item_schema.dump(new_item)), 201
+        try:
+            result = run_write(job)
+        except (OrderError, OutOfStock) as err:
+            return err.response()
+        except GroupCommitTimeout:
+            return group_commit_timeout_response()
+        return jsonify(result), 201
     
 class OrderItemDetailView(MethodView):
     @jwt_required()
     def delete(self, item_id):
-        uid = int(get_jwt_identity())
-        user = User.query.get(uid)
-
-        if not user:
-            return jsonify({"msg": "Usuario no encontrado"}), 404
-        
-        item = OrderItem.query.get(item_id)
+        # Se bloquea el item para que dos bajas concurrentes no resten dos veces
+        item = OrderItem.query.with_for_update().filter_by(id=item_id).first()
 
         if not item:
             return jsonify({"msg": "Item no encontrado"}), 404
         
         order = Order.query.get(item.order_id)
 
-        if order.user_id != uid and user.role != "admin":
+        if order.user_id != current_user.id and not current_user.is_admin:
             return jsonify({"msg": "No tienes permiso para eliminar este item"}), 403
         
+        if order.status != "CANCELADO":
+            release_product(order.menu_day_id, item.product_id, item.quantity) # Devolver las porciones
         db.session.delete(item)
-        db.session.flush()  # Eliminar el item antes de recalcular
-        
-        # Recalcular y guardar el total de la orden
-        order.calculate_total_price()
+
+        # Restar el item del total de la orden
+        try:
+            adjust_total(order.id, -item.price, requested_version())
+        except OrderError as err:
+            db.session.rollback()
+            return err.response()
         db.session.commit()
         return jsonify({"msg": "Item eliminado exitosamente"}), 200
     
     @jwt_required()
     def put(self, item_id):
-        uid = int(get_jwt_identity())
-        user = User.query.get(uid)
-
-        if not user:
-            return jsonify({"msg": "Usuario no encontrado"}), 404
-        
-        item = OrderItem.query.get(item_id)
+        # Se bloquea el item: el delta del total depende de su precio anterior
+        item = OrderItem.query.with_for_update().filter_by(id=item_id).first()
 
         if not item:
             return jsonify({"msg": "Item no encontrado"}), 404
         
         order = Order.query.get(item.order_id)
 
-        if order.user_id != uid and user.role != "admin":
+        if order.user_id != current_user.id and not current_user.is_admin:
             return jsonify({"msg": "No tienes permiso para modificar este item"}), 403
         
         data = request.get_json()
         if not data:
             return jsonify({"msg": "Datos invalidos"}), 400
         
-        order_item_schema = OrderItemSchema()
         try:
-            order_item_data = order_item_schema.load(data, partial=True) # Validar datos con Marshmallow
+            order_item_data = loader(OrderItemSchema, partial=True).load(data) # Validar datos (marshmallow si hay errores)
         except ValidationError as err:
             return jsonify(err.messages), 400
         
@@ -583,16 +940,35 @@ class OrderItemDetailView(MethodView):
             return jsonify({"msg": "Este producto no está en el menú del día de la orden"}), 400
         
         # Actualizar campos del item de orden
+        old_price = item.price
+        old_product_id, old_quantity = item.product_id, item.quantity
         item.product_id = order_item_data.get('product_id', item.product_id)
         item.quantity = order_item_data.get('quantity', item.quantity)
         item.price = product.price * item.quantity # Recalcular el precio total del item
 
-        db.session.flush()  # Guardar cambios del item antes de recalcular
-        
-        # Recalcular y guardar el total de la orden
-        order.calculate_total_price()
+        # Devolver las porciones anteriores y tomar las nuevas (solo la diferencia si es el mismo producto)
+        if order.status != "CANCELADO":
+            try:
+                if item.product_id == old_product_id:
+                    if item.quantity > old_quantity:
+                        take_products(order.menu_day_id, {item.product_id: item.quantity - old_quantity})
+                    else:
+                        release_product(order.menu_day_id, item.product_id, old_quantity - item.quantity)
+                else:
+                    take_products(order.menu_day_id, {item.product_id: item.quantity})
+                    release_product(order.menu_day_id, old_product_id, old_quantity)
+            except OutOfStock as err:
+                db.session.rollback()
+                return err.response()
+
+        # Ajustar el total de la orden por la diferencia de precio
+        try:
+            adjust_total(order.id, item.price - old_price, requested_version())
+        except OrderError as err:
+            db.session.rollback()
+            return err.response()
         db.session.commit()
-        return jsonify(order_item_schema.dump(item)), 200
+        return jsonify(compiled(OrderItemSchema).dump(item)), 200
     
 # fin de las vistas
     
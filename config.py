@@ -12,11 +12,110 @@ class Config:
 
     # JWT
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev_jwt")
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=12)
+    # Access tokens cortos; se renuevan en /auth/refresh sin volver a verificar la contraseña
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_MINUTES", 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv("JWT_REFRESH_DAYS", 30)))
+    # Tokens ya verificados que se guardan por proceso hasta su exp (0 la deshabilita)
+    JWT_DECODE_CACHE_SIZE = int(os.getenv("JWT_DECODE_CACHE_SIZE", 4096))
+    # Cache por proceso de filas de User (0 la deshabilita), ver app/identity.py
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 1024))
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 60))
+    # Cada cuanto se leen de la base los tokens revocados en otros procesos
+    REVOCATION_REFRESH_SECONDS = int(os.getenv("REVOCATION_REFRESH_SECONDS", 30))
+
+    # Hashing de contraseñas (pool acotado, ver app/passwords.py)
+    # Hilos por proceso del servidor WSGI (gunicorn --threads, waitress threads=...).
+    # Tiene que coincidir con el del servidor: los limites de abajo salen de aca
+    SERVER_THREADS = int(os.getenv("SERVER_THREADS", 8))
+    # Requests hasheando o esperando el pool a la vez; la siguiente recibe 503. Tiene
+    # que quedar por debajo de SERVER_THREADS: si no, los logins pueden ocupar todos
+    # los hilos del servidor y las demas requests esperan en su cola en vez de
+    # que el login responda 503. Por defecto la mitad de los hilos
+    PASSWORD_HASH_MAX_IN_FLIGHT = int(os.getenv("PASSWORD_HASH_MAX_IN_FLIGHT", max(1, SERVER_THREADS // 2)))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(os.cpu_count() or 2, PASSWORD_HASH_MAX_IN_FLIGHT)))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 2))
+    # Metodo fijo (ej: "scrypt:32768:8:1"). Si no se pone se usa el que guardo
+    # `flask passwords calibrate` en PASSWORD_HASH_METHOD_FILE (por defecto
+    # instance/password_hash_method), y si tampoco esta el de werkzeug. El comando
+    # elige el candidato mas costoso que verifica en menos de PASSWORD_HASH_TARGET_MS
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD")
+    PASSWORD_HASH_METHOD_FILE = os.getenv("PASSWORD_HASH_METHOD_FILE")
+    PASSWORD_HASH_TARGET_MS = int(os.getenv("PASSWORD_HASH_TARGET_MS", 250))
+    PASSWORD_HASH_CANDIDATES = os.getenv(
+        "PASSWORD_HASH_CANDIDATES",
+        "scrypt:16384:8:1,scrypt:32768:8:1,scrypt:65536:8:1,scrypt:131072:8:1").split(",")
+
+    # Proxies de confianza delante de la app (nginx = 1): remote_addr pasa a ser la IP del
+    # cliente segun X-Forwarded-For. En 0 no se confia en esos headers (acceso directo)
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    PROXY_FIX_X_PROTO = int(os.getenv("PROXY_FIX_X_PROTO", 0))
+
+    # Limite de intentos de login (token buckets por usuario y por IP), ver app/ratelimit.py
+    LOGIN_RATE_ENABLED = os.getenv("LOGIN_RATE_ENABLED", "1") == "1"
+    LOGIN_RATE_BACKEND = os.getenv("LOGIN_RATE_BACKEND", "shm") # shm, memory o db
+    LOGIN_RATE_SHM_PATH = os.getenv("LOGIN_RATE_SHM_PATH")
+    LOGIN_RATE_USER_BURST = int(os.getenv("LOGIN_RATE_USER_BURST", 5))
+    LOGIN_RATE_USER_PER_MINUTE = float(os.getenv("LOGIN_RATE_USER_PER_MINUTE", 5))
+    LOGIN_RATE_IP_BURST = int(os.getenv("LOGIN_RATE_IP_BURST", 30))
+    LOGIN_RATE_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", 60))
+
+    # Paginacion de los listados (ver app/pagination.py). Sin ?limit= se devuelven
+    # PAGINATION_DEFAULT_LIMIT filas y el cursor de la siguiente pagina en X-Next-Cursor
+    PAGINATION_DEFAULT_LIMIT = int(os.getenv("PAGINATION_DEFAULT_LIMIT", 50))
+    PAGINATION_MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", 200))
+
+    # Planillas de produccion de menus cerrados guardadas por proceso (0 la deshabilita)
+    PRODUCTION_CACHE_SIZE = int(os.getenv("PRODUCTION_CACHE_SIZE", 256))
+    # Atraso maximo frente a cambios hechos en otros procesos
+    PRODUCTION_CACHE_TTL = int(os.getenv("PRODUCTION_CACHE_TTL", 30))
+
+    # Stream SSE de cambios de estado de ordenes (ver app/events.py)
+    ORDER_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("ORDER_EVENTS_HEARTBEAT_SECONDS", 15))
+    ORDER_EVENTS_BUFFER = int(os.getenv("ORDER_EVENTS_BUFFER", 100))     # eventos por conexion
+    ORDER_EVENTS_HISTORY = int(os.getenv("ORDER_EVENTS_HISTORY", 1000))  # para retomar con Last-Event-ID
+    # Streams abiertos a la vez por proceso; cada uno ocupa un hilo del servidor, asi
+    # que tiene que quedar bien por debajo de SERVER_THREADS (el siguiente recibe 503)
+    ORDER_EVENTS_MAX_STREAMS = int(os.getenv("ORDER_EVENTS_MAX_STREAMS", max(1, SERVER_THREADS // 4)))
+
+    # Idempotency-Key en POST /orders y POST /order_items (ver app/idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 4096))
+
+    # Filas en que se reparte el cupo de cada item del menu (ver app/stock.py)
+    STOCK_SHARDS = int(os.getenv("STOCK_SHARDS", 8))
+
+    # Group commit de las escrituras de ordenes en la hora pico (ver app/groupcommit.py)
+    GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 50))
+    GROUP_COMMIT_TIMEOUT = float(os.getenv("GROUP_COMMIT_TIMEOUT", 10))
+
+    # Aceptacion asincronica de ordenes con "Prefer: respond-async" (ver app/submissions.py)
+    ORDER_ASYNC_ENABLED = os.getenv("ORDER_ASYNC_ENABLED", "1") == "1"
+    ORDER_ASYNC_WORKERS = int(os.getenv("ORDER_ASYNC_WORKERS", 2))  # 0: solo `flask orders process-submissions`
+    ORDER_ASYNC_BATCH = int(os.getenv("ORDER_ASYNC_BATCH", 50))
+    ORDER_ASYNC_POLL_SECONDS = float(os.getenv("ORDER_ASYNC_POLL_SECONDS", 1))
+    # Errores inesperados al crear una orden antes de dejar el pedido FALLIDA
+    ORDER_ASYNC_MAX_ATTEMPTS = int(os.getenv("ORDER_ASYNC_MAX_ATTEMPTS", 3))
+    MENU_CACHE_SIZE = int(os.getenv("MENU_CACHE_SIZE", 64))
+    MENU_CACHE_TTL = int(os.getenv("MENU_CACHE_TTL", 30))
+
+    # Paginas de GET /products ya serializadas, por proceso (ver app/catalog.py; 0 la deshabilita)
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 64))
+    CATALOG_GZIP = os.getenv("CATALOG_GZIP", "1") == "1"
+    CATALOG_GZIP_MIN_SIZE = int(os.getenv("CATALOG_GZIP_MIN_SIZE", 1024))
+
+    # Segundos que cada proceso reusa las versiones de table_versions para los ETag (ver app/versions.py)
+    TABLE_VERSIONS_TTL = float(os.getenv("TABLE_VERSIONS_TTL", 1))
+
+    # JSON de las respuestas (ver app/jsonprovider.py): "fast" o "compat" (el de Flask, salida identica a antes)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "fast")
+    # "auto" usa orjson si esta instalado; "orjson" o "json" para forzar uno
+    JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
 
     JSON_AS_ASCII = False
     PROPAGATE_EXCEPTIONS = True
 
 
 
-    
\ No newline at end of file
+
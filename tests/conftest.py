@@ -0,0 +1,25 @@
+import os
+
+# Antes de importar la app: config.py lee el entorno al cargarse
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "clave-de-pruebas-de-32-bytes-o-mas")
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+os.environ.setdefault("ORDER_ASYNC_WORKERS", "0")
+os.environ.setdefault("LOGIN_RATE_BACKEND", "memory")
+
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
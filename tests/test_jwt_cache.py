@@ -0,0 +1,28 @@
+# CachingJWTManager sobreescribe un metodo privado de JWTManager: si una version
+# nueva de flask_jwt_extended lo renombra, la cache deja de usarse sin avisar.
+
+from flask_jwt_extended import JWTManager
+
+from app import jwt
+
+
+def auth_header(client, username):
+    client.post("/auth/register", json={"username": username, "password": "pw"})
+    token = client.post("/auth/login", json={"username": username, "password": "pw"}).get_json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_override_still_exists_in_jwt_manager():
+    assert hasattr(JWTManager, "_decode_jwt_from_config")
+
+
+def test_second_request_hits_the_cache(client):
+    headers = auth_header(client, "cache")
+    assert jwt.token_cache.enabled
+
+    client.get("/orders", headers=headers)
+    hits = jwt.token_cache.hits
+    response = client.get("/orders", headers=headers)
+
+    assert response.status_code == 200
+    assert jwt.token_cache.hits > hits
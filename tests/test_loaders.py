@@ -0,0 +1,100 @@
+# Los cargadores compilados tienen que aceptar y rechazar lo mismo que
+# Schema().load, con los mismos datos y los mismos mensajes de error
+# (ver app/serializers.py).
+
+import pytest
+from marshmallow import ValidationError
+
+from app.schemas import OrderSchema, OrderItemSchema
+from app.serializers import PRELOADED, loader
+
+ITEMS = [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}]
+
+PAYLOADS = {
+    OrderSchema: [
+        {"menu_day_id": 1, "items": ITEMS},
+        {"user_id": 3, "menu_day_id": 1, "items": ITEMS},
+        {"user_id": 3, "menu_day_id": 1},
+        {"menu_day_id": 1, "status": "CREADO"},
+        {"status": "ENTREGADO"},
+        {"menu_day_id": 1, "items": []},
+        {},
+        # Conversiones que resuelve marshmallow
+        {"menu_day_id": "1", "items": ITEMS},
+        {"menu_day_id": 1.0, "items": [{"product_id": "1", "quantity": 2.0}]},
+        # Errores
+        {"menu_day_id": None, "items": ITEMS},
+        {"menu_day_id": True},
+        {"menu_day_id": "uno"},
+        {"menu_day_id": 1, "status": "INVENTADO"},
+        {"menu_day_id": 1, "status": None},
+        {"menu_day_id": 1, "items": None},
+        {"menu_day_id": 1, "items": {"product_id": 1, "quantity": 1}},
+        {"menu_day_id": 1, "items": [{"product_id": 1, "quantity": 0}]},
+        {"menu_day_id": 1, "items": [{"product_id": 1}]},
+        {"menu_day_id": 1, "items": [{"product_id": 1, "quantity": 1, "extra": 1}]},
+        {"menu_day_id": 1, "items": [None]},
+        {"menu_day_id": 1, "items": [{"product_id": 1, "quantity": 1}] * 101},
+        {"menu_day_id": 1, "id": 5},
+        {"menu_day_id": 1, "total_price": 10},
+        {"menu_day_id": 1, "otro": 1},
+        [],
+        "orden",
+        None,
+    ],
+    OrderItemSchema: [
+        {"order_id": 1, "product_id": 2, "quantity": 3},
+        {"quantity": 3},
+        {},
+        {"order_id": "1", "product_id": 2, "quantity": "3"},
+        {"order_id": 1, "product_id": 2, "quantity": None},
+        {"order_id": 1, "product_id": 2, "quantity": False},
+        {"order_id": 1, "product_id": 2, "quantity": 1.5},
+        {"order_id": 1, "product_id": 2, "quantity": 0},
+        {"quantity": -10},
+        {"order_id": 1, "product_id": 2},
+        {"order_id": 1, "product_id": 2, "quantity": 3, "price": 1.0},
+        {"order_id": 1, "product_id": 2, "quantity": 3, "otro": 1},
+        [{"order_id": 1}],
+        None,
+    ],
+}
+
+
+def outcome(load, data):
+    """("ok", datos) o ("error", mensajes)"""
+    try:
+        return "ok", load(data)
+    except ValidationError as error:
+        return "error", error.messages
+
+
+@pytest.mark.parametrize("schema_class,partial", PRELOADED, ids=lambda value: getattr(value, "__name__", repr(value)))
+def test_load_same_as_marshmallow(schema_class, partial):
+    compiled_load = loader(schema_class, partial).load
+    schema = schema_class()
+    for data in PAYLOADS[schema_class]:
+        expected = outcome(lambda value: schema.load(value, partial=partial), data)
+        assert outcome(compiled_load, data) == expected, data
+
+
+@pytest.mark.parametrize("schema_class,partial", PRELOADED, ids=lambda value: getattr(value, "__name__", repr(value)))
+def test_fast_path_used_for_valid_payloads(schema_class, partial):
+    # El payload comun no tiene que caer en marshmallow
+    fast = loader(schema_class, partial).fast
+    assert fast is not None
+    data = PAYLOADS[schema_class][0]
+    assert fast(data) == schema_class().load(data, partial=partial)
+
+
+def test_loader_once():
+    assert loader(OrderItemSchema, True) is loader(OrderItemSchema, True)
+
+
+@pytest.mark.parametrize("partial", [None, True])
+@pytest.mark.parametrize("quantity", [0, -10])
+def test_order_item_quantity_must_be_positive(partial, quantity):
+    data = {"order_id": 1, "product_id": 2, "quantity": quantity}
+    with pytest.raises(ValidationError) as error:
+        loader(OrderItemSchema, partial).load(data)
+    assert "quantity" in error.value.messages
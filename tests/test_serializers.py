@@ -0,0 +1,85 @@
+# Los serializadores compilados tienen que dar exactamente lo mismo que
+# Schema().dump de marshmallow (ver app/serializers.py).
+
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from marshmallow import fields
+
+from app.serializers import PRECOMPILED, compiled
+
+NOW = datetime(2024, 5, 17, 12, 30, 5, 123456)
+
+# Valores de prueba por tipo de campo: el normal y los que fuerzan conversion
+VALUES = {
+    fields.Integer: [7, 0, True, 3.0],
+    fields.Float: [2.5, 10, Decimal("7.50"), 0.0],
+    fields.String: ["Milanesa", "", "Ñandú con acentos"],
+    fields.Boolean: [True, False],
+    fields.DateTime: [NOW, datetime(2024, 1, 1)],
+    fields.Date: [date(2024, 5, 17)],
+}
+
+
+def sample(schema_class, variant=0, nested_count=2):
+    """Objeto con todos los campos de salida del esquema"""
+    attributes = {}
+    for name, field in schema_class().dump_fields.items():
+        attribute = field.attribute or name
+        if isinstance(field, fields.Nested):
+            nested = field.nested
+            if field.many:
+                value = [sample(nested, variant + n) for n in range(nested_count)]
+            else:
+                value = sample(nested, variant)
+        else:
+            options = VALUES[type(field)]
+            value = options[variant % len(options)]
+        attributes[attribute] = value
+    return SimpleNamespace(**attributes)
+
+
+def cases(schema_class):
+    schema = schema_class()
+    full = sample(schema_class)
+    yield "completo", full
+    yield "otra variante", sample(schema_class, variant=1)
+    yield "todo None", SimpleNamespace(**{(field.attribute or name): None for name, field in schema.dump_fields.items()})
+    # Sin el atributo: marshmallow omite la clave
+    for name, field in schema.dump_fields.items():
+        partial = vars(sample(schema_class)).copy()
+        partial.pop(field.attribute or name)
+        yield f"sin {name}", SimpleNamespace(**partial)
+    nested = [name for name, field in schema.dump_fields.items() if isinstance(field, fields.Nested) and field.many]
+    for name in nested:
+        yield f"{name} vacio", SimpleNamespace(**{**vars(full), name: []})
+
+
+@pytest.mark.parametrize("schema_class", PRECOMPILED, ids=lambda s: s.__name__)
+def test_dump_same_as_marshmallow(schema_class):
+    serializer = compiled(schema_class)
+    schema = schema_class()
+    for label, obj in cases(schema_class):
+        assert serializer.dump(obj) == schema.dump(obj), label
+
+
+@pytest.mark.parametrize("schema_class", PRECOMPILED, ids=lambda s: s.__name__)
+def test_dump_many_same_as_marshmallow(schema_class):
+    objs = [sample(schema_class, variant) for variant in range(4)]
+    assert compiled(schema_class).dump_many(objs) == schema_class(many=True).dump(objs)
+    assert compiled(schema_class).dump_many([]) == []
+
+
+@pytest.mark.parametrize("schema_class", PRECOMPILED, ids=lambda s: s.__name__)
+def test_dump_keeps_types(schema_class):
+    # 10 y 10.0 son iguales para ==, pero no en el JSON
+    obj = sample(schema_class, variant=1)
+    expected = schema_class().dump(obj)
+    result = compiled(schema_class).dump(obj)
+    assert {key: type(value) for key, value in result.items()} == {key: type(value) for key, value in expected.items()}
+
+
+def test_compiled_once():
+    assert compiled(PRECOMPILED[0]) is compiled(PRECOMPILED[0])